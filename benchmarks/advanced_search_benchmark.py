@@ -0,0 +1,264 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+# Benchmark of the advanced search modes (full, light, string and replace) on a synthetic corpus.
+# Each mode runs in a new process (cold caches, own peak RSS) with an empty results folder.
+# Usage: python -m benchmarks.advanced_search_benchmark [--corpus FOLDER | --size-mb 20 --seed 0]
+#                                                       [--modes full,light,string,replace]
+#                                                       [--output results.json] [--compare previous.json]
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tabulate import tabulate
+from benchmarks.corpus_generator import PLANTED_SECRETS_FILE, generate_corpus
+
+MODES = ["full", "light", "string", "replace"]
+SEARCH_STRING = b"const-string"
+REPLACE_STRING = b"const-text"
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process and of its (terminated) worker processes.
+
+    Returns:
+        float: Peak RSS in MB (None if not available on the platform).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Bytes on macOS, KB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def corpus_files(corpus):
+    """
+    Files of the corpus (the list of the planted secrets excluded).
+
+    Args:
+        corpus (str): Folder of the corpus.
+
+    Returns:
+        tuple: (number of files, total bytes)
+    """
+    files, size = 0, 0
+    for rootpath, _, filenames in os.walk(corpus):
+        for filename in filenames:
+            if filename != PLANTED_SECRETS_FILE:
+                files += 1
+                size += os.path.getsize(os.path.join(rootpath, filename))
+
+    return files, size
+
+def recall(corpus, matches):
+    """
+    Share of the planted secrets found by a secrets search.
+
+    Args:
+        corpus (str): Folder of the corpus.
+        matches (list): Results of the search (dicts with the Regex, File and Offset columns).
+
+    Returns:
+        float: Found planted secrets / planted secrets (None if no secret was planted, e.g. in a real corpus).
+    """
+    if not os.path.exists(os.path.join(corpus, PLANTED_SECRETS_FILE)):
+        return None
+
+    with open(os.path.join(corpus, PLANTED_SECRETS_FILE), "r", encoding="utf-8") as f:
+        planted_secrets = json.load(f)
+    if not planted_secrets:
+        return None
+
+    found = {}
+    for match in matches:
+        found.setdefault((os.path.relpath(match["File"], corpus), match["Regex"]), []).append(int(match["Offset"]))
+
+    # A planted secret is found if a match of its pattern starts inside it (or right before, for the patterns with a prefix)
+    recalled = sum(1 for secret in planted_secrets
+                   if any(secret["offset"] - 1 <= offset < secret["offset"] + secret["length"]
+                          for offset in found.get((secret["file"], secret["pattern"]), [])))
+
+    return recalled / len(planted_secrets)
+
+def run_mode(mode, corpus):
+    """
+    Run a mode of the advanced search (in the current process, in the current folder).
+
+    Args:
+        mode (str): One of MODES.
+        corpus (str): Folder of the corpus.
+
+    Returns:
+        dict: Elapsed seconds, number of results and recall (secrets searches only).
+    """
+    from modules import advanced_search
+    from modules.scan_scheduler import run_scheduled
+    from modules.worker_pool import get_worker_pool, shutdown_worker_pool
+
+    all_files = advanced_search.gather_files(corpus, expand_archives=True)
+    result = {}
+    start_time = time.perf_counter()
+
+    if mode in ("full", "light"):
+        results_filepath, summary = advanced_search.secrets_search(all_files, mode == "light", force_rescan=True)
+        result["elapsed"] = time.perf_counter() - start_time
+
+        matches = []
+        if results_filepath:
+            with open(os.path.splitext(results_filepath)[0] + ".jsonl", "r", encoding="utf-8") as f:
+                matches = [json.loads(line) for line in f]
+        result["results"] = len(matches)
+        result["recall"] = recall(corpus, matches)
+
+    elif mode == "string":
+        results = 0
+        for file_matches in advanced_search.cached_scan(all_files, advanced_search.bytes_search_in_file, [SEARCH_STRING.lower()],
+                                                        advanced_search.rules_version("string", SEARCH_STRING.lower()),
+                                                        advanced_search.strings_to_findings, advanced_search.strings_from_findings,
+                                                        force_rescan=True):
+            results += len(file_matches)
+        result["elapsed"] = time.perf_counter() - start_time
+        result["results"] = results
+
+    elif mode == "replace":
+        all_files = list(all_files)
+        results = 0
+        for _, file_results in run_scheduled(get_worker_pool(), all_files, advanced_search.bytes_replacement_in_file,
+                                             [SEARCH_STRING, REPLACE_STRING, False, None], split_files=False):
+            results += sum(count for _, count, _, _ in file_results)
+        result["elapsed"] = time.perf_counter() - start_time
+        result["results"] = results
+
+    # The workers are terminated, so that their peak RSS is counted
+    shutdown_worker_pool()
+    return result
+
+def benchmark_mode(mode, corpus):
+    """
+    Run a mode in a new process, in an empty working folder (the replace mode works on a copy of the corpus).
+
+    Args:
+        mode (str): One of MODES.
+        corpus (str): Folder of the corpus.
+
+    Returns:
+        dict: Results of the mode (see run_mode) with the peak RSS.
+    """
+    with tempfile.TemporaryDirectory(prefix="hackndroid_benchmark_") as work_folder:
+        if mode == "replace":
+            target = os.path.join(work_folder, "corpus")
+            shutil.copytree(corpus, target)
+        else:
+            target = corpus
+
+        result_file = os.path.join(work_folder, "result.json")
+        # The scan functions print each file, only the result file is kept
+        subprocess.run([sys.executable, "-m", "benchmarks.advanced_search_benchmark", "--run-mode", mode,
+                        "--corpus", target, "--output", result_file],
+                       cwd=work_folder, stdout=subprocess.DEVNULL, check=True,
+                       env=dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                                                     os.environ.get("PYTHONPATH")]))))
+
+        with open(result_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+def print_results(report, previous=None):
+    """
+    Print the results of the benchmark (with the change from a previous run).
+
+    Args:
+        report (dict): Results of the benchmark.
+        previous (dict): Results of a previous run (no comparison if None).
+    """
+    def change(mode, key):
+        value = report["modes"][mode].get(key)
+        old = (previous or {}).get("modes", {}).get(mode, {}).get(key)
+        if value is None:
+            return "-"
+        if not old:
+            return f"{value:.2f}" if isinstance(value, float) else str(value)
+        return f"{value:.2f} ({100 * (value - old) / old:+.1f}%)"
+
+    table = [[mode, change(mode, "files_per_second"), change(mode, "mb_per_second"), change(mode, "peak_rss_mb"),
+              change(mode, "results"), change(mode, "recall")]
+             for mode in report["modes"]]
+
+    print(f"Corpus: {report['corpus']['files']} files, {report['corpus']['mb']:.1f} MB, {report['cpus']} CPUs")
+    print(tabulate(table, headers=["Mode", "Files/s", "MB/s", "Peak RSS (MB)", "Results", "Recall"], tablefmt='fancy_grid'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the advanced search modes")
+    parser.add_argument("--corpus", help="Folder of an existing corpus (generated in a temporary folder if missing)")
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--output", help="JSON file of the results")
+    parser.add_argument("--compare", help="JSON file of a previous run")
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        # Single mode in this process (see benchmark_mode)
+        result = run_mode(args.run_mode, os.path.abspath(args.corpus))
+        result["peak_rss_mb"] = peak_rss_mb()
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode {mode} (available: {', '.join(MODES)})")
+
+    with tempfile.TemporaryDirectory(prefix="hackndroid_corpus_") as corpus_folder:
+        if args.corpus:
+            corpus = os.path.abspath(args.corpus)
+        else:
+            corpus = corpus_folder
+            print(f"Generating a {args.size_mb} MB corpus (seed {args.seed})...")
+            generate_corpus(corpus, args.size_mb, args.seed)
+
+        files, size = corpus_files(corpus)
+        report = {
+            "corpus": {"path": args.corpus, "size_mb": args.size_mb, "seed": args.seed, "files": files, "mb": size / (1024 * 1024)},
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "modes": {}
+        }
+
+        for mode in modes:
+            print(f"Running the {mode} mode...")
+            result = benchmark_mode(mode, corpus)
+            result["files_per_second"] = files / result["elapsed"]
+            result["mb_per_second"] = size / (1024 * 1024) / result["elapsed"]
+            report["modes"][mode] = result
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    print_results(report, previous)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+# Cost per MB of the high-entropy string detector, compared with the light secrets scan.
+# Usage: python -m benchmarks.entropy_benchmark [file or folder]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.advanced_search import CHUNK_SIZE, gather_files, get_pattern_set, scan_windows, secrets_scan
+from modules.entropy_detector import EntropyDetector, MAX_TOKEN_LENGTH
+
+SAMPLE_SIZE = 8 * 1024 * 1024
+
+def smali_sample(size):
+    """
+    Synthetic smali-like content, with a few random tokens.
+
+    Args:
+        size (int): Size of the content.
+
+    Returns:
+        bytes: The content.
+    """
+    rng = random.Random(0)
+    lines = [b"    invoke-virtual {p0, p1}, Lokhttp3/internal/http2/Http2Connection;->onCreate(Ljava/lang/String;)V\n",
+             b"    iget-object v0, p0, Lcom/example/app/ui/main/MainViewModel;->mView:Landroid/view/View;\n",
+             b"    const-string v1, \"android.intent.action.VIEW\"\n",
+             b"    .line 121\n",
+             b"    move-result-object v3\n"]
+    alphabet = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+    content = bytearray()
+    while len(content) < size:
+        if rng.random() < 0.01:
+            token = bytes(rng.choice(alphabet) for _ in range(rng.randint(20, 60)))
+            content += b"    const-string v2, \"" + token + b"\"\n"
+        else:
+            content += rng.choice(lines)
+
+    return bytes(content[:size])
+
+def benchmark(name, buffers):
+    """
+    Print the cost per MB of the detector and of the light secrets scan on the same content.
+
+    Args:
+        name (str): Name of the content.
+        buffers (list): Contents to be scanned (e.g. one for each file).
+    """
+    detector = EntropyDetector()
+    _, pattern_set = get_pattern_set(True)
+    overlap = max(pattern_set.overlap, MAX_TOKEN_LENGTH + 1)
+    size_mb = sum(len(b) for b in buffers) / (1024 * 1024)
+
+    start_time = time.perf_counter()
+    tokens = 0
+    for buffer in buffers:
+        for start, end, report_end in scan_windows(len(buffer), CHUNK_SIZE, overlap):
+            tokens += len(detector.scan(buffer, start, end, report_end))
+    entropy_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for buffer in buffers:
+        resume = {}
+        for start, end, report_end in scan_windows(len(buffer), CHUNK_SIZE, overlap):
+            secrets_scan(buffer, start, end, report_end, name, True, resume)
+    regex_time = time.perf_counter() - start_time
+
+    print(f"{name}: {size_mb:.1f} MB, {tokens} high-entropy tokens")
+    print(f"  entropy detector: {entropy_time * 1000 / size_mb:.1f} ms/MB")
+    print(f"  light regex scan: {regex_time * 1000 / size_mb:.1f} ms/MB")
+
+def main():
+    benchmark("smali-like", [smali_sample(SAMPLE_SIZE)])
+    benchmark("random binary", [random.Random(1).randbytes(SAMPLE_SIZE)])
+
+    if len(sys.argv) > 1:
+        buffers = []
+        for _, filepath in gather_files(sys.argv[1]):
+            with open(filepath, "rb") as f:
+                buffers.append(f.read())
+        benchmark(sys.argv[1], buffers)
+
+if __name__ == "__main__":
+    main()
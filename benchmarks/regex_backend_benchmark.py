@@ -0,0 +1,211 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+# Speed and finding parity of the regex backends (regex module vs RE2) for each secrets rule, on the same corpus.
+# Each rule is evaluated on the whole content of every file (no prefilter), with every backend.
+# Usage: python -m benchmarks.regex_backend_benchmark [--corpus FOLDER | --size-mb 20 --seed 0] [--light]
+#                                                     [--output results.csv] [--write-pack re2_rules.json]
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tabulate import tabulate
+from benchmarks.corpus_generator import PLANTED_SECRETS_FILE, generate_corpus
+from modules.advanced_search import file_buffer, gather_files
+from modules.regex_backends import BACKENDS, BackendError
+from modules.rule_packs import REGEX_FLAGS, load_rule_packs
+
+BASELINE = "regex"
+CANDIDATE = "re2"
+# Max seconds of each evaluation of the backtracking backend
+TIMEOUT = 10.0
+
+def compile_entries(rules, light_search):
+    """
+    Compile every entry of the rules with every backend.
+
+    Args:
+        rules (dict): Rules returned by load_rule_packs.
+        light_search (bool): Only the entries enabled for the light search.
+
+    Returns:
+        list: (rule name, entry index, entry, {backend name: compiled pattern or error message}) tuples.
+    """
+    entries = []
+    for name, rule_entries in rules.items():
+        for index, entry in enumerate(rule_entries):
+            if light_search and not entry["light_search"]:
+                continue
+
+            flags = 0
+            for flag in entry["flags"]:
+                flags |= REGEX_FLAGS[flag]
+
+            compiled = {}
+            for backend in (BASELINE, CANDIDATE):
+                try:
+                    compiled[backend] = BACKENDS[backend].compile(entry["regex"].encode("latin-1"), flags)
+                except BackendError as e:
+                    compiled[backend] = str(e)
+            entries.append((name, index, entry, compiled))
+
+    return entries
+
+def run_backends(entries, all_files):
+    """
+    Evaluate every compiled entry on every file.
+
+    Args:
+        entries (list): Entries returned by compile_entries.
+        all_files (list): (root path, file path) couples.
+
+    Returns:
+        list: {backend name: [seconds, set of (file, start, end), timeouts]} of each entry.
+    """
+    stats = [{backend: [0.0, set(), 0] for backend, compiled in entry[3].items() if not isinstance(compiled, str)} for entry in entries]
+
+    for _, filepath in all_files:
+        try:
+            with file_buffer(filepath) as buffer:
+                for entry, entry_stats in zip(entries, stats):
+                    for backend, backend_stats in entry_stats.items():
+                        start_time = time.perf_counter()
+                        try:
+                            for match in entry[3][backend].finditer(buffer, 0, len(buffer), timeout=TIMEOUT):
+                                backend_stats[1].add((filepath, match.start(), match.end()))
+                        except TimeoutError:
+                            backend_stats[2] += 1
+                        backend_stats[0] += time.perf_counter() - start_time
+        except (FileNotFoundError, IOError) as e:
+            print(f"Error opening {filepath}: {e}", file=sys.stderr)
+
+    return stats
+
+def compare(entries, stats):
+    """
+    Speed and parity of the candidate backend for each entry.
+
+    Returns:
+        list: Dicts with the rule, the time and findings of each backend, the speedup and the parity.
+    """
+    rows = []
+    for (name, index, entry, compiled), entry_stats in zip(entries, stats):
+        baseline_time, baseline_found, baseline_timeouts = entry_stats[BASELINE]
+        row = {"rule": name, "entry": index, "regex_seconds": baseline_time, "regex_findings": len(baseline_found),
+               "regex_timeouts": baseline_timeouts}
+
+        if CANDIDATE not in entry_stats:
+            row.update({"re2_seconds": None, "re2_findings": None, "speedup": None, "parity": False,
+                        "missing": None, "extra": None, "note": compiled[CANDIDATE]})
+        else:
+            candidate_time, candidate_found, _ = entry_stats[CANDIDATE]
+            missing, extra = len(baseline_found - candidate_found), len(candidate_found - baseline_found)
+            row.update({"re2_seconds": candidate_time, "re2_findings": len(candidate_found),
+                        "speedup": baseline_time / candidate_time if candidate_time else None,
+                        # A timed out evaluation of the baseline has partial findings
+                        "parity": not missing and not extra and not baseline_timeouts,
+                        "missing": missing, "extra": extra, "note": ""})
+        rows.append(row)
+
+    return rows
+
+def print_rows(rows):
+    def seconds(value):
+        return "-" if value is None else f"{value:.3f}"
+
+    table = []
+    for row in sorted(rows, key=lambda r: r["regex_seconds"], reverse=True):
+        if row["re2_findings"] is None:
+            parity = "unsupported"
+        elif row["parity"]:
+            parity = "yes"
+        else:
+            parity = f"no (-{row['missing']}/+{row['extra']})" + (f", {row['regex_timeouts']} timeouts" if row["regex_timeouts"] else "")
+        table.append([row["rule"] + (f" #{row['entry'] + 1}" if row["entry"] else ""), seconds(row["regex_seconds"]), seconds(row["re2_seconds"]),
+                      "-" if row["speedup"] is None else f"{row['speedup']:.1f}x", row["regex_findings"],
+                      "-" if row["re2_findings"] is None else row["re2_findings"], parity])
+
+    print(tabulate(table, headers=["Rule", "regex (s)", "re2 (s)", "Speedup", "regex findings", "re2 findings", "Parity"], tablefmt='fancy_grid', disable_numparse=True))
+
+    supported = [row for row in rows if row["re2_findings"] is not None]
+    print(f"{len(rows)} rules, {len(supported)} supported by re2, {sum(row['parity'] for row in rows)} with the same findings")
+    print(f"Total: regex {sum(row['regex_seconds'] for row in supported):.2f}s, "
+          f"re2 {sum(row['re2_seconds'] for row in supported):.2f}s (supported rules)")
+
+def write_pack(rows, rules, pack_file, min_speedup):
+    """
+    Write a rule pack moving to re2 the entries with the same findings and at least min_speedup
+    (the other entries of the same rules keep the regex backend).
+
+    Returns:
+        int: Number of entries moved to re2.
+    """
+    chosen = {(row["rule"], row["entry"]) for row in rows if row["parity"] and (row["speedup"] or 0) >= min_speedup}
+
+    pack_rules = {}
+    for name, entries in rules.items():
+        if any((name, index) in chosen for index in range(len(entries))):
+            pack_rules[name] = [{"regex": entry["regex"], "flags": entry["flags"], "light_search": entry["light_search"],
+                                 "backend": CANDIDATE if (name, index) in chosen else BASELINE}
+                                for index, entry in enumerate(entries)]
+
+    with open(pack_file, "w", encoding="utf-8") as f:
+        json.dump({"name": "Rules moved to re2 by the regex backend benchmark", "rules": pack_rules}, f, indent=4)
+
+    return len(chosen)
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed and finding parity of the regex backends for each secrets rule")
+    parser.add_argument("--corpus", help="Folder of an existing corpus (generated in a temporary folder if missing)")
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--light", action="store_true", help="Only the rules of the light search")
+    parser.add_argument("--output", help="CSV file of the results of each rule")
+    parser.add_argument("--write-pack", help="Rule pack moving to re2 the rules with the same findings and faster")
+    parser.add_argument("--min-speedup", type=float, default=1.0, help="Min speedup of the rules moved to re2 (--write-pack)")
+    args = parser.parse_args()
+
+    if not BACKENDS[CANDIDATE].available:
+        parser.error("google-re2 is not installed (pip install google-re2)")
+
+    # The rules of the rule packs as written (the backend chosen by the packs is ignored)
+    rules, _ = load_rule_packs()
+    entries = compile_entries(rules, args.light)
+
+    with tempfile.TemporaryDirectory(prefix="hackndroid_corpus_") as corpus_folder:
+        if args.corpus:
+            corpus = os.path.abspath(args.corpus)
+        else:
+            corpus = corpus_folder
+            print(f"Generating a {args.size_mb} MB corpus (seed {args.seed})...")
+            generate_corpus(corpus, args.size_mb, args.seed)
+
+        all_files = [f for f in gather_files(corpus) if os.path.basename(f[1]) != PLANTED_SECRETS_FILE]
+        print(f"Running {len(entries)} rules with the {BASELINE} and {CANDIDATE} backends on {len(all_files)} files...")
+        rows = compare(entries, run_backends(entries, all_files))
+
+    print_rows(rows)
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Results saved to {args.output}")
+
+    if args.write_pack:
+        moved = write_pack(rows, rules, args.write_pack, args.min_speedup)
+        print(f"{moved} rules moved to {CANDIDATE} in {args.write_pack} (copy it to a rule packs folder to use it)")
+
+if __name__ == "__main__":
+    main()
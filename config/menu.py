@@ -22,7 +22,8 @@ OPTIONS =   {
                                     'children': {
                                         "full_search" : {
                                             'description' : ["Full search for secrets in the file/folder\n(it could generate a lot of false positives)",
-                                                            "Specify the file/folder path on your PC",],
+                                                            "Specify the file/folder path on your PC",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
                                             'device_needed': False,
                                             'input_needed': True,
                                             'children': {
@@ -34,7 +35,8 @@ OPTIONS =   {
                                         },
                                         "light_search" : {
                                             'description' : ["Light search for secrets in the file/folder\n(it could generate few false positives)",
-                                                            "Specify the file/folder path on your PC",],
+                                                            "Specify the file/folder path on your PC",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
                                             'device_needed': False,
                                             'input_needed': True,
                                             'children': {
@@ -44,6 +46,46 @@ OPTIONS =   {
                                             
                                             'function': advanced_search.light_secrets_search
                                         },
+                                        "full_rescan" : {
+                                            'description' : ["Full search for secrets in the file/folder, ignoring the results of the previous scans\n(it could generate a lot of false positives)",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+
+                                            'function': advanced_search.full_secrets_rescan
+                                        },
+                                        "light_rescan" : {
+                                            'description' : ["Light search for secrets in the file/folder, ignoring the results of the previous scans\n(it could generate few false positives)",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+
+                                            'function': advanced_search.light_secrets_rescan
+                                        },
+                                        "profile_rules" : {
+                                            'description' : ["Full search for secrets in the file/folder, measuring the time, matches and slowest file",
+                                                            "of each rule (the regexes exceeding the timeout are interrupted)",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+
+                                            'function': advanced_search.profile_secrets_search
+                                        },
                                         "back" : dict(),
                                         "home" : dict()
                                     },
@@ -55,7 +97,8 @@ OPTIONS =   {
                                         "search_string" : {
                                             'description' : ["Search for a string/bytes sequence (CASE INSENSITIVE) in the file/folder",
                                                             "Specify the file/folder path on your PC",
-                                                            "(if folder the search will be recursive in all the files)",],
+                                                            "(if folder the search will be recursive in all the files)",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
                                             'device_needed': False,
                                             'input_needed': True,
                                             'children': {
@@ -65,10 +108,55 @@ OPTIONS =   {
                                             
                                             'function': advanced_search.search_string_in_files
                                         },
+                                        "search_string_rescan" : {
+                                            'description' : ["Search for a string/bytes sequence (CASE INSENSITIVE) in the file/folder, ignoring the results of the previous scans",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(if folder the search will be recursive in all the files)",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+
+                                            'function': advanced_search.search_string_rescan
+                                        },
+                                        "search_needles" : {
+                                            'description' : ["Search all the strings/bytes sequences of a file (one for each line) in the file/folder",
+                                                            "with a single pass (CASE INSENSITIVE)",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(if folder the search will be recursive in all the files)",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+                                            
+                                            'function': advanced_search.search_needles_in_files
+                                        },
+                                        "search_needles_rescan" : {
+                                            'description' : ["Search all the strings/bytes sequences of a file (one for each line) in the file/folder",
+                                                            "with a single pass (CASE INSENSITIVE), ignoring the results of the previous scans",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(if folder the search will be recursive in all the files)",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+
+                                            'function': advanced_search.search_needles_rescan
+                                        },
                                         "replace_string" : {
                                             'description' : ["Replacement a string/bytes sequence (CASE SENSITIVE) in the file/folder",
                                                             "Specify the file/folder path on your PC",
-                                                            "(if folder the search will be recursive in all the files)",],
+                                                            "(if folder the search will be recursive in all the files)",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
                                             'device_needed': False,
                                             'input_needed': True,
                                             'children': {
@@ -78,6 +166,33 @@ OPTIONS =   {
                                             
                                             'function': advanced_search.replace_string_in_files
                                         },
+                                        "replace_dry_run" : {
+                                            'description' : ["Count the occurrences of a string/bytes sequence (CASE SENSITIVE) that would be replaced",
+                                                            "in the file/folder, without modifying the files",
+                                                            "Specify the file/folder path on your PC",
+                                                            "(options: --include GLOB --exclude GLOB --max-size MB --all-types)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+                                            
+                                            'function': advanced_search.replace_string_dry_run
+                                        },
+                                        "undo_replace" : {
+                                            'description' : ["Restore the files modified by a replacement",
+                                                            "Specify the undo manifest (or its folder) saved by the replacement",
+                                                            "(results/advanced_search/<date>_replace_undo/manifest.json)",],
+                                            'device_needed': False,
+                                            'input_needed': True,
+                                            'children': {
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+                                            
+                                            'function': advanced_search.undo_replacement
+                                        },
                                         "back" : dict(),
                                         "home" : dict()
                                     },
@@ -169,6 +284,36 @@ OPTIONS =   {
                                                 "home" : dict()
                                             },
                                         },
+                                        "fast_hints" : { 
+                                            'description': ['Fast search for Certificate Pinning and Root Detection strings in the DEX files (without decompiling the APK)',],
+                                            'device_needed': False,
+                                            'children': {
+                                                "from_apk_on_pc" : { 
+                                                    'description': ["Fast certificate pinning and root detection hints on an apk file on your PC",
+                                                                    "Write the path of the apk on your PC",],
+                                                    'device_needed': False,
+                                                    'input_needed': True,
+                                                    'children': {
+                                                        "back" : dict(),
+                                                        "home" : dict()
+                                                    },
+                                                    'function' : apk_analyzer.fast_analysis_from_file
+                                                },
+                                                "from_mobile_device" : { 
+                                                    'description': ["Fast certificate pinning and root detection hints on an application on your mobile device",
+                                                                    "Write the app id or a part of the app name to be analysed",],
+                                                    'device_needed': True,
+                                                    'input_needed': True,
+                                                    'children': {
+                                                        "back" : dict(),
+                                                        "home" : dict()
+                                                    },
+                                                    'function': apk_analyzer.fast_analysis_from_device
+                                                },
+                                                "back" : dict(),
+                                                "home" : dict()
+                                            },
+                                        },
                                         "signature_scheme" : { 
                                             'description': ["Signature scheme verifier"
                                                             ],
@@ -5,7 +5,8 @@ Licensed under the Apache License v2.0
 """
 
 import platform
-import re
+import queue
+import multiprocessing
 from modules.utility import app_id_from_user_input, current_date, valid_apk_file, valid_aab_file
 from modules.file_transfer import download
 from modules.merge_apks import merge_from_dir
@@ -19,6 +20,11 @@ from pathlib import Path
 from termcolor import colored, cprint
 from alive_progress import alive_bar
 from modules.app_info import app_info_from_apk, app_id_from_apk
+from modules.hints_matcher import hints_in_unit
+from modules.dex_parser import DexError, dex_hints
+from modules.decompile_cache import ENTRY_INFO_FILE, decompiled_apk, release_decompiled_apk
+from modules.scan_scheduler import work_units
+from modules.worker_pool import get_worker_pool
 import xml.etree.ElementTree as ET
 import zipfile
 import sys
@@ -202,6 +208,85 @@ def certificate_pinning_hints_from_file(user_input):
     # Perform analysis on the APK file for certificate pinning hints
     perform_apk_analysis(apk_filepath, checks=["Certificate Pinning Hints"], print_output=True)
 
+def fast_analysis_from_device(user_input):
+    """
+    Fast analysis of an APK from the device for certificate pinning and root detection hints (no decompilation).
+
+    Args:
+        user_input (str): The App ID or keywords to identify the application.
+    """
+    # Get the APK from the device
+    apk_filepath, app_id = get_apk_from_device(user_input, False)
+    # Perform the analysis on the DEX files of the APK
+    perform_fast_apk_analysis(apk_filepath)
+
+def fast_analysis_from_file(user_input):
+    """
+    Fast analysis of an APK file from the local filesystem for certificate pinning and root detection hints (no decompilation).
+
+    Args:
+        user_input (str): The path to the APK file.
+    """
+    # Check if the path is valid for an APK file
+    apk_filepath = valid_apk_file(user_input)
+    # Perform the analysis on the DEX files of the APK
+    perform_fast_apk_analysis(apk_filepath)
+
+def perform_fast_apk_analysis(apk_filepath, checks=["Certificate Pinning Hints", "Root Detection Hints"]):
+    """
+    Perform the smali checks on the string pool of the DEX files of an APK, without decompiling it with apktool.
+    The hints of each DEX file are printed as soon as it is analyzed, with the classes using the matching string
+    in place of the line number (the full analysis gives the line-level detail).
+
+    Args:
+        apk_filepath (str): The path to the APK file.
+        checks (list): List of analysis checks to perform (e.g., "Certificate Pinning Hints", "Root Detection Hints").
+
+    Returns:
+        dict: Analysis results.
+    """
+    global APK_ANALYSIS_DICT
+    print(colored(f"Fast analysis of the DEX files of: ", 'cyan') + apk_filepath)
+
+    # Prepare results folder
+    now = current_date()
+    app_id = app_id_from_apk(apk_filepath)
+    results_folder = os.path.join("results", app_id, "apk_analysis", now)
+    os.makedirs(results_folder, exist_ok=True)
+
+    # Define output files for analysis results
+    output_files = {
+        "Certificate Pinning Hints": os.path.join(results_folder, "certificate_pinning_hints_dex.csv"),
+        "Root Detection Hints": os.path.join(results_folder, "root_detection_hints_dex.csv")
+    }
+
+    results = {}
+    try:
+        for dex_name, feature, check_type, check, classes, string in dex_hints(apk_filepath, APK_ANALYSIS_DICT["*.smali"], checks):
+            if feature not in results:
+                results[feature] = {}
+
+            if check_type not in results[feature]:
+                results[feature][check_type] = []
+
+            # A string can be used by many classes (none for the strings of the signatures and debug info)
+            evidence = {
+                'regex': check,
+                'file': dex_name,
+                'line_number': " ".join(classes) if classes else "-",
+                'line_content': string.strip().replace("\r", "\\r").replace("\n", "\\n")
+            }
+            results[feature][check_type].append(evidence)
+
+            cprint(f"[{check_type}] {evidence['file']}:{evidence['line_number']}:", 'yellow', end=" ")
+            print(evidence['line_content'])
+    except (zipfile.BadZipFile, DexError) as e:
+        print(colored(f"Invalid APK {apk_filepath}: {e}", 'red'))
+        return results
+
+    write_hints(results, output_files, checks)
+    return results
+
 def perform_apk_analysis(apk_filepath, checks=["Certificate Pinning Hints", "Root Detection Hints"], print_output=False):
     """
     Perform analysis on an APK file.
@@ -216,8 +301,11 @@ def perform_apk_analysis(apk_filepath, checks=["Certificate Pinning Hints", "Roo
     
     # Decompile the APK file
     now = current_date()
-    folder_path = apk_decompiler_from_file(apk_filepath)
-    
+    folder_path = cached_decompiler_from_file(apk_filepath)
+    if folder_path is None:
+        print(colored(f"Decompilation of {apk_filepath} failed, APK not analyzed", 'red'))
+        return
+
     # Prepare results folder
     app_id = app_id_from_apk(apk_filepath)
     results_folder = os.path.join("results", app_id, "apk_analysis", now)
@@ -231,7 +319,12 @@ def perform_apk_analysis(apk_filepath, checks=["Certificate Pinning Hints", "Roo
 
     # Perform APK analysis
     schemes, certificates, utc_time = None, None, None
-    results = analyse_apk(folder_path, APK_ANALYSIS_DICT, output_files, checks, print_output)
+    try:
+        results = analyse_apk(folder_path, APK_ANALYSIS_DICT, output_files, checks, print_output)
+    finally:
+        # The cached tree can be evicted once analyzed
+        release_decompiled_apk(folder_path)
+
     if len(checks) == 2:
         schemes, certificates, utc_time = signature_verifier_from_apk(apk_filepath, print_output)
 
@@ -266,6 +359,25 @@ def print_pinning_root_hints(results):
             print("")
     print("")
 
+def write_hints(results, output_files, checks):
+    """
+    Write the hints of each analysis check to its CSV file.
+
+    Args:
+        results (dict): The analysis results.
+        output_files (dict): Dictionary mapping analysis types to output file paths.
+        checks (list): List of analysis checks performed.
+    """
+    print("\n\nResults:")
+    for feature in checks:
+        with open(output_files[feature], 'w') as results_f:
+            # A check without hints has an empty file
+            for check_type in results.get(feature, {}):
+                for evidence in results[feature][check_type]:
+                    results_f.write(f"{check_type},{evidence['regex']},{evidence['file']}," +
+                                    f"{evidence['line_number']},{evidence['line_content'].strip()}\n")
+            print("\nresults written to ", colored(output_files[feature], 'red'))
+
 def analyse_apk(folder_path, re_apk_analysis_dict, output_files, checks, print_output):
     """
     Analyze the decompiled APK files for specific patterns.
@@ -282,54 +394,65 @@ def analyse_apk(folder_path, re_apk_analysis_dict, output_files, checks, print_o
     """
     folder = Path(folder_path)
     results = {}
-    
-    for file_format in re_apk_analysis_dict:
-        # Find all files matching the specified format
-        files = [str(f) for f in list(folder.rglob(file_format)) if not str(f).startswith(folder_path + "/original") and not str(f).startswith(folder_path + "\\original")]
-        print("")
+    executor = get_worker_pool()
 
-        # Analyze each file
-        with alive_bar(len(files), title=colored(file_format, 'red')) as bar:
-            for target_file in files:
-                bar.text(colored(target_file, 'yellow'))
-                with open(target_file, 'r', encoding='utf-8') as f:
-                    for line_number, line in enumerate(f, start=1):
-                        features = [f for f in re_apk_analysis_dict[file_format] if f in checks]
-
-                        for feature in features:
-                            for check_type in re_apk_analysis_dict[file_format][feature]:
-                                for check in re_apk_analysis_dict[file_format][feature][check_type]:
-                                    try:
-                                        if re.search(check, line):
-                                            # Add the details of the occurrence
-                                            if feature not in results:
-                                                results[feature] = {}
-
-                                            if check_type not in results[feature]:
-                                                results[feature][check_type] = []
-
-                                            results[feature][check_type].append({
-                                                'regex': check,
-                                                'file': target_file,
-                                                'line_number': line_number,
-                                                'line_content': line.strip()
-                                            })
-                                    except re.error as e:
-                                        print(f"ERROR: {check}")
-
-                bar()
-
-            bar.title(colored(file_format, 'green'))
+    # Progress of the workers (a managed queue can be passed to the pool tasks)
+    with multiprocessing.Manager() as manager:
+        for file_format in re_apk_analysis_dict:
+            # Find all files matching the specified format
+            files = [str(f) for f in list(folder.rglob(file_format)) if not str(f).startswith(folder_path + "/original") and not str(f).startswith(folder_path + "\\original")]
+            print("")
+
+            # Files analyzed in parallel by the workers, in size-balanced batches
+            progress = manager.Queue()
+            features = [feature for feature in re_apk_analysis_dict[file_format] if feature in checks]
+            futures = [executor.submit(hints_in_unit, unit, re_apk_analysis_dict[file_format], features, progress)
+                       for unit in work_units([(folder_path, target_file) for target_file in files], split_files=False)]
+
+            try:
+                with alive_bar(len(files), title=colored(file_format, 'red')) as bar:
+                    completed = 0
+                    while completed < len(files):
+                        try:
+                            count, target_file = progress.get(timeout=1)
+                        except queue.Empty:
+                            # A worker process died without reporting its files
+                            if all(future.done() for future in futures):
+                                break
+                            continue
+
+                        bar.text(colored(target_file, 'yellow'))
+                        bar(count)
+                        completed += count
+
+                    bar.title(colored(file_format, 'green'))
+
+                # Results merged in file order (the same order of a serial analysis)
+                file_hints = {}
+                for future in futures:
+                    file_hints.update(future.result())
+            finally:
+                for future in futures:
+                    future.cancel()
+
+            for index in range(len(files)):
+                for feature, check_type, check, line_number, line_content in file_hints[index]:
+                    # Add the details of the occurrence
+                    if feature not in results:
+                        results[feature] = {}
+
+                    if check_type not in results[feature]:
+                        results[feature][check_type] = []
+
+                    results[feature][check_type].append({
+                        'regex': check,
+                        'file': files[index],
+                        'line_number': line_number,
+                        'line_content': line_content
+                    })
 
     # Write results to output files
-    print("\n\nResults:")
-    for feature in checks:
-        with open(output_files[feature], 'w') as results_f:
-            for check_type in results[feature]:            
-                for evidence in results[feature][check_type]:
-                    results_f.write(f"{check_type},{evidence['regex']},{evidence['file']}," +
-                                    f"{evidence['line_number']},{evidence['line_content'].strip()}\n")
-            print("\nresults written to ", colored(output_files[feature], 'red'))
+    write_hints(results, output_files, checks)
 
     # Optionally print results to stdout
     if print_output:
@@ -390,15 +513,17 @@ def apk_decompiler_from_device(user_input):
 
 def apk_decompiler_from_file(user_input):
     """
-    Decompile an APK file
+    Decompile an APK file into results/<app_id>/decompiled/<date> (a copy of the cached tree,
+    that can be modified or rebuilt)
 
     Parameters:
     user_input (str): Path of the APK file on the PC 
     """
-    
-    print("Decompiling the APK...", end=" ")
-    # Check if the path is valid for an APK file
     apk_path = valid_apk_file(user_input)
+    cached_folder = cached_decompiler_from_file(apk_path)
+
+    if cached_folder is None:
+        return None
 
     # Folder name for the decompiled APK is the name of the APK without extension 
     app_id = app_id_from_apk(apk_path)
@@ -410,12 +535,58 @@ def apk_decompiler_from_file(user_input):
     now = current_date()
     decompiled_folder = os.path.join(dest_folder, now)
 
-    # Decompile the program
-    # apktool d APP.apk -o <dir>
-    command = ['apktool','d', user_input, "-o", decompiled_folder]
+    try:
+        shutil.copytree(cached_folder, decompiled_folder, ignore=shutil.ignore_patterns(ENTRY_INFO_FILE))
+    finally:
+        release_decompiled_apk(cached_folder)
+    print("Decompiled APK: " + colored(decompiled_folder, 'yellow'))
 
-    output, error = Task().run(command, is_shell=True)
-    print("DONE")
+    return decompiled_folder
+
+
+def cached_decompiler_from_device(user_input):
+    """
+    Get the APKs of an app from the device and decompile it into the decompilation cache
+
+    Parameters:
+    user_input (str): App ID or words belonging to the APP ID 
+
+    Returns:
+    str: Folder of the cached tree (read-only, to be released with release_decompiled_apk) or None if the decompilation failed
+    """
+    apk_filepath, app_id = get_apk_from_device(user_input, False)
+    print(apk_filepath)
+
+    return cached_decompiler_from_file(apk_filepath)
+
+
+def cached_decompiler_from_file(user_input):
+    """
+    Decompile an APK file into the decompilation cache, reusing the tree of the same APK
+    (for the analyses that only read the tree)
+
+    Parameters:
+    user_input (str): Path of the APK file on the PC 
+
+    Returns:
+    str: Folder of the cached tree (read-only, to be released with release_decompiled_apk) or None if the decompilation failed
+    """
+    print("Decompiling the APK...", end=" ")
+    # Check if the path is valid for an APK file
+    apk_path = valid_apk_file(user_input)
+
+    def decompile(decompiled_folder):
+        # Decompile the program
+        # apktool d APP.apk -o <dir>
+        command = ['apktool','d', apk_path, "-o", decompiled_folder]
+
+        task = Task()
+        output, error = task.run(command, is_shell=True)
+        return task._PROCESS.returncode == 0
+
+    # The same APK is decompiled once for each apktool version (see the decompilation cache)
+    decompiled_folder = decompiled_apk(apk_path, decompile)
+    print("DONE" if decompiled_folder else colored("FAILED", 'red'))
 
     return decompiled_folder
 
@@ -0,0 +1,288 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import mmap
+import os
+import tempfile
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Archives whose members are scanned without extracting them to disk
+ARCHIVE_EXTENSIONS = (".apk", ".aab", ".apks", ".xapk", ".apkm", ".aar", ".jar", ".zip")
+# Separator between an archive and the path of one of its members (e.g. app.apks!base.apk!classes.dex)
+ARCHIVE_SEPARATOR = "!"
+# Max nesting level of the archives (e.g. 2 for an AAR inside an APK)
+MAX_ARCHIVE_DEPTH = 3
+# Archives kept open by each process (the members of an archive are usually read one after the other)
+MAX_OPEN_ARCHIVES = 4
+# Max bytes of a file kept resident by a worker (larger archive members are extracted to a temporary file)
+MAX_FILE_MEMORY = 64 * 1024 * 1024
+# Bytes decompressed at a time from an archive member
+MEMBER_BLOCK_SIZE = 1024 * 1024
+
+# (archive, temporary file of a nested archive or None) by archive path, size and mtime
+_OPEN_ARCHIVES = OrderedDict()
+
+def is_archive(path):
+    """
+    Check if a file (or an archive member) is an archive to be scanned member by member.
+
+    Args:
+        path (str): Path of the file or of the archive member.
+
+    Returns:
+        bool: True if the file is an archive.
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def is_archive_member(path):
+    """
+    Check if a path is the path of an archive member (archive!member).
+
+    Args:
+        path (str): Path to be checked.
+
+    Returns:
+        bool: True if the path refers to an archive member.
+    """
+    return ARCHIVE_SEPARATOR in path and not os.path.exists(path)
+
+def _split_outer(path):
+    # The file on disk is before the first separator following an existing file
+    # (the member names can contain the separator too)
+    index = path.find(ARCHIVE_SEPARATOR)
+    while index != -1:
+        if os.path.isfile(path[:index]):
+            return path[:index], path[index + 1:]
+        index = path.find(ARCHIVE_SEPARATOR, index + 1)
+
+    raise IOError(f"No archive on disk for {path}")
+
+def _split_member(path):
+    # (path of the archive containing the member, member name), the archive can be a member itself:
+    # a separator starts a nested archive only if what precedes it is an archive member
+    archive_path, member = _split_outer(path)
+
+    while True:
+        names = open_archive(archive_path).NameToInfo
+        if member in names:
+            return archive_path, member
+
+        index = member.find(ARCHIVE_SEPARATOR)
+        while index != -1 and not (member[:index] in names and is_archive(member[:index])):
+            index = member.find(ARCHIVE_SEPARATOR, index + 1)
+
+        if index == -1:
+            raise IOError(f"Missing member {path}")
+
+        archive_path = archive_path + ARCHIVE_SEPARATOR + member[:index]
+        member = member[index + 1:]
+
+def _outer_file(path):
+    # File on disk containing the member (at any nesting level)
+    return _split_outer(path)[0] if is_archive_member(path) else path
+
+def open_archive(archive_path):
+    """
+    Open an archive on disk or inside another archive (kept open for the next members).
+
+    Args:
+        archive_path (str): Path of the archive (archive!member for the nested ones).
+
+    Returns:
+        zipfile.ZipFile: The opened archive.
+
+    Raises:
+        IOError: If the archive can't be read.
+    """
+    stat = os.stat(_outer_file(archive_path))
+    key = (archive_path, stat.st_size, stat.st_mtime_ns)
+
+    if key in _OPEN_ARCHIVES:
+        _OPEN_ARCHIVES.move_to_end(key)
+        return _OPEN_ARCHIVES[key][0]
+
+    temp = None
+    try:
+        if is_archive_member(archive_path):
+            # Nested archive (e.g. base.apk inside an .apks), extracted to a temporary file
+            # (deleted when it's closed, together with the archive)
+            temp = tempfile.TemporaryFile()
+            try:
+                for block in member_blocks(archive_path):
+                    temp.write(block)
+                archive = zipfile.ZipFile(temp)
+            except BaseException:
+                temp.close()
+                raise
+        else:
+            archive = zipfile.ZipFile(archive_path)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, ValueError) as e:
+        raise IOError(f"Invalid archive {archive_path}: {e}")
+
+    _OPEN_ARCHIVES[key] = (archive, temp)
+    while len(_OPEN_ARCHIVES) > MAX_OPEN_ARCHIVES:
+        _, (old_archive, old_temp) = _OPEN_ARCHIVES.popitem(last=False)
+        old_archive.close()
+        if old_temp is not None:
+            # Not closed by the archive (a file object passed to ZipFile)
+            old_temp.close()
+
+    return archive
+
+def _member_info(path):
+    # (open archive, ZipInfo) of an archive member
+    archive_path, member = _split_member(path)
+    archive = open_archive(archive_path)
+    return archive, archive.getinfo(member)
+
+def read_member(path, size=-1):
+    """
+    Read the content of an archive member.
+
+    Args:
+        path (str): Path of the member (archive!member).
+        size (int): Bytes to be read from the beginning (the whole member if -1).
+
+    Returns:
+        bytes: Decompressed content of the member.
+
+    Raises:
+        IOError: If the member can't be read.
+    """
+    try:
+        archive, info = _member_info(path)
+        with archive.open(info) as f:
+            return f.read(size)
+    except (KeyError, RuntimeError, zipfile.BadZipFile, NotImplementedError, EOFError) as e:
+        # Missing, encrypted or corrupted members
+        raise IOError(f"Unable to read {path}: {e}")
+
+def member_blocks(path, block_size=MEMBER_BLOCK_SIZE):
+    """
+    Decompress an archive member block by block (never the whole member in memory).
+
+    Args:
+        path (str): Path of the member (archive!member).
+        block_size (int): Bytes of each block.
+
+    Yields:
+        bytes: The blocks of the decompressed content.
+
+    Raises:
+        IOError: If the member can't be read.
+    """
+    try:
+        archive, info = _member_info(path)
+        with archive.open(info) as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                yield block
+    except (KeyError, RuntimeError, zipfile.BadZipFile, NotImplementedError, EOFError) as e:
+        raise IOError(f"Unable to read {path}: {e}")
+
+@contextmanager
+def member_buffer(path):
+    """
+    Content of an archive member: in memory up to MAX_FILE_MEMORY bytes, otherwise extracted
+    to a temporary file and mapped in memory (so that its pages can be released while scanning).
+
+    Args:
+        path (str): Path of the member (archive!member).
+
+    Yields:
+        bytes or mmap.mmap: The content.
+
+    Raises:
+        IOError: If the member can't be read.
+    """
+    if content_stat(path)[0] <= MAX_FILE_MEMORY:
+        yield read_member(path)
+        return
+
+    with tempfile.TemporaryFile() as temp:
+        for block in member_blocks(path):
+            temp.write(block)
+        temp.flush()
+
+        buffer = mmap.mmap(temp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+def read_header(path, size):
+    """
+    Read the beginning of a file or of an archive member.
+
+    Args:
+        path (str): Path of the file or of the archive member.
+        size (int): Bytes to be read.
+
+    Returns:
+        bytes: First bytes of the content.
+    """
+    if is_archive_member(path):
+        return read_member(path, size)
+
+    with open(path, "rb") as f:
+        return f.read(size)
+
+def content_stat(path):
+    """
+    Size and modification time of a file or of an archive member
+    (the modification time of a member is the one of the file on disk containing it).
+
+    Args:
+        path (str): Path of the file or of the archive member.
+
+    Returns:
+        tuple: (size, mtime_ns)
+
+    Raises:
+        OSError: If the file or the member can't be accessed.
+    """
+    if not is_archive_member(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    _, info = _member_info(path)
+    return info.file_size, os.stat(_outer_file(path)).st_mtime_ns
+
+def iter_archive_members(archive_path, depth=1):
+    """
+    List the members of an archive, recursing into the nested archives.
+
+    Args:
+        archive_path (str): Path of the archive (archive!member for the nested ones).
+        depth (int): Nesting level of the archive.
+
+    Yields:
+        tuple: (member path as archive!member, member size)
+    """
+    try:
+        members = open_archive(archive_path).infolist()
+    except IOError:
+        return
+
+    for info in members:
+        if info.is_dir():
+            continue
+
+        member_path = archive_path + ARCHIVE_SEPARATOR + info.filename
+
+        if is_archive(info.filename) and depth < MAX_ARCHIVE_DEPTH:
+            try:
+                open_archive(member_path)
+            except IOError:
+                # Not a valid archive, scanned as a regular member
+                yield member_path, info.file_size
+                continue
+
+            # Nested archive (e.g. AAR inside an APK, APKs inside an .apks)
+            yield from iter_archive_members(member_path, depth + 1)
+        else:
+            yield member_path, info.file_size
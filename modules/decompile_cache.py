@@ -0,0 +1,293 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import glob
+import hashlib
+import json
+import os
+import psutil
+import re
+import shutil
+import time
+from termcolor import colored
+from modules.tasks_management import Task
+
+# Decompiled trees of the APKs, by APK content and apktool version
+DECOMPILE_CACHE_FOLDER = os.path.join("results", "decompile_cache")
+# Max size of the cache in MB (the least recently used trees are removed)
+DECOMPILE_CACHE_SIZE_ENV = "HACKNDROID_DECOMPILE_CACHE_MB"
+DEFAULT_CACHE_SIZE_MB = 5 * 1024
+
+# Metadata of a cached tree (size and APK), its mtime is the last use
+ENTRY_INFO_FILE = ".hackndroid_cache.json"
+# A lock not released for this long belongs to a decompilation that was killed
+STALE_LOCK_SECONDS = 30 * 60
+# Trees used less than this long ago are never evicted
+RECENT_USE_SECONDS = 10 * 60
+# Marker of a process reading a tree (next to the tree, with the PID of the process)
+USE_MARKER_SUFFIX = ".use-"
+LOCK_POLL_SECONDS = 0.5
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_APKTOOL_VERSION = None
+# Uses of the cached trees by this process (a tree can be used by more analyses at the same time)
+_TREE_USES = {}
+
+def apktool_version():
+    """
+    Version of apktool (asked once for the session).
+
+    Returns:
+        str: The version ("unknown" if apktool doesn't answer).
+    """
+    global _APKTOOL_VERSION
+
+    if _APKTOOL_VERSION is None:
+        try:
+            output, _ = Task().run(['apktool', '-version'], is_shell=True)
+            lines = output.decode('utf-8', errors='replace').split() if output else []
+            _APKTOOL_VERSION = lines[-1] if lines else "unknown"
+        except OSError:
+            _APKTOOL_VERSION = "unknown"
+
+    return _APKTOOL_VERSION
+
+def apk_sha256(apk_path):
+    """
+    SHA-256 of an APK file.
+
+    Args:
+        apk_path (str): Path of the APK.
+
+    Returns:
+        str: Hex digest.
+    """
+    h = hashlib.sha256()
+    with open(apk_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def cache_size_limit():
+    """
+    Max size of the decompilation cache (HACKNDROID_DECOMPILE_CACHE_MB environment variable).
+
+    Returns:
+        int: Max size in bytes.
+    """
+    try:
+        size_mb = float(os.environ.get(DECOMPILE_CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE_MB))
+    except ValueError:
+        size_mb = DEFAULT_CACHE_SIZE_MB
+
+    return int(size_mb * 1024 * 1024)
+
+def folder_size(folder):
+    """
+    Size of the files of a folder (recursively).
+
+    Args:
+        folder (str): Path of the folder.
+
+    Returns:
+        int: Size in bytes.
+    """
+    size = 0
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+def _acquire_lock(lock_path):
+    # True if the lock was acquired, False if another caller holds it
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        return False
+
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+def _release_lock(lock_path):
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+
+def _entry_info(entry_folder):
+    # (last use, size) of a cached tree, None if it's not a complete tree
+    info_path = os.path.join(entry_folder, ENTRY_INFO_FILE)
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        return os.path.getmtime(info_path), int(info["size"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _add_use(entry_folder):
+    # The marker is written while holding the lock of the tree, so that it can't be evicted in the meantime
+    _TREE_USES[entry_folder] = _TREE_USES.get(entry_folder, 0) + 1
+    with open(f"{entry_folder}{USE_MARKER_SUFFIX}{os.getpid()}", "w") as f:
+        f.write(str(os.getpid()))
+
+def _in_use(entry_folder):
+    # True if a running process is reading the tree (the markers of the dead processes are removed)
+    in_use = False
+    for marker in glob.glob(glob.escape(entry_folder + USE_MARKER_SUFFIX) + "*"):
+        try:
+            pid = int(marker.rsplit(USE_MARKER_SUFFIX, 1)[1])
+        except ValueError:
+            continue
+
+        if psutil.pid_exists(pid):
+            in_use = True
+        else:
+            try:
+                os.remove(marker)
+            except OSError:
+                pass
+
+    return in_use
+
+def release_decompiled_apk(entry_folder):
+    """
+    Tell the cache that a tree returned by decompiled_apk is no longer read by this process
+    (until then it can't be evicted).
+
+    Args:
+        entry_folder (str): Folder of the tree.
+    """
+    uses = _TREE_USES.get(entry_folder, 0) - 1
+    if uses > 0:
+        _TREE_USES[entry_folder] = uses
+        return
+
+    _TREE_USES.pop(entry_folder, None)
+    try:
+        os.remove(f"{entry_folder}{USE_MARKER_SUFFIX}{os.getpid()}")
+    except OSError:
+        pass
+
+def evict_entries(keep=None):
+    """
+    Remove the least recently used trees until the cache is not larger than its limit
+    (the trees being decompiled or read, the ones used in the last RECENT_USE_SECONDS and the kept one are never removed).
+
+    Args:
+        keep (str): Folder of a tree to be kept (the one just used).
+
+    Returns:
+        int: Number of removed trees.
+    """
+    entries = []
+    for name in os.listdir(DECOMPILE_CACHE_FOLDER):
+        entry_folder = os.path.join(DECOMPILE_CACHE_FOLDER, name)
+        info = _entry_info(entry_folder)
+        if info is not None:
+            entries.append((info[0], info[1], entry_folder))
+
+    total_size = sum(size for _, size, _ in entries)
+    limit = cache_size_limit()
+    removed = 0
+
+    for last_use, size, entry_folder in sorted(entries):
+        if total_size <= limit:
+            break
+        if keep and os.path.abspath(entry_folder) == os.path.abspath(keep):
+            continue
+        if time.time() - last_use < RECENT_USE_SECONDS:
+            continue
+
+        lock_path = entry_folder + ".lock"
+        if not _acquire_lock(lock_path):
+            continue
+        try:
+            # Checked with the lock held: no process can start reading the tree until it's released
+            if _in_use(entry_folder):
+                continue
+
+            # Renamed first, so that no caller can reuse a partially removed tree
+            trash = f"{entry_folder}.evicted-{os.getpid()}"
+            os.rename(entry_folder, trash)
+            shutil.rmtree(trash, ignore_errors=True)
+            total_size -= size
+            removed += 1
+        except OSError:
+            pass
+        finally:
+            _release_lock(lock_path)
+
+    return removed
+
+def decompiled_apk(apk_path, decompile):
+    """
+    Decompiled tree of an APK, reused if the same APK was already decompiled with the same apktool version.
+    The callers of the same APK wait for a single decompilation (lock file next to the tree).
+    The cached trees are shared, they shouldn't be modified. A returned tree is not evicted
+    until the caller releases it with release_decompiled_apk (or its process ends).
+
+    Args:
+        apk_path (str): Path of the APK.
+        decompile (callable): Decompile the APK into a folder (path as its argument), returning True on success.
+
+    Returns:
+        str: Folder of the decompiled tree or None if the decompilation failed.
+    """
+    os.makedirs(DECOMPILE_CACHE_FOLDER, exist_ok=True)
+
+    version = re.sub(r"[^\w.-]", "_", apktool_version())
+    entry_folder = os.path.join(DECOMPILE_CACHE_FOLDER, f"{apk_sha256(apk_path)}_{version}")
+    info_path = os.path.join(entry_folder, ENTRY_INFO_FILE)
+    lock_path = entry_folder + ".lock"
+    waiting = False
+
+    # The lock is held also to reuse a tree, so that it can't be evicted between the check and the use marker
+    while not _acquire_lock(lock_path):
+        if not waiting:
+            waiting = True
+            print(colored("waiting for the decompilation of the same APK in progress...", 'yellow'), end=" ")
+        time.sleep(LOCK_POLL_SECONDS)
+
+    try:
+        # A tree is complete once renamed to its final folder
+        if os.path.isfile(info_path):
+            try:
+                # Last use for the LRU eviction
+                os.utime(info_path)
+            except OSError:
+                pass
+            _add_use(entry_folder)
+            print(colored("reused from the cache", 'green'), end=" ")
+            return entry_folder
+
+        temp_folder = f"{entry_folder}.tmp-{os.getpid()}"
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+        if not decompile(temp_folder) or not os.path.isdir(temp_folder):
+            shutil.rmtree(temp_folder, ignore_errors=True)
+            return None
+
+        with open(os.path.join(temp_folder, ENTRY_INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump({"apk": os.path.abspath(apk_path), "apktool": apktool_version(), "size": folder_size(temp_folder)}, f)
+
+        # A tree left by a killed decompilation is replaced
+        shutil.rmtree(entry_folder, ignore_errors=True)
+        os.rename(temp_folder, entry_folder)
+        _add_use(entry_folder)
+    finally:
+        _release_lock(lock_path)
+
+    evict_entries(keep=entry_folder)
+    return entry_folder
@@ -0,0 +1,455 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import re
+import struct
+import zipfile
+import zlib
+from bisect import bisect_right
+from modules.encoding_variants import decode_mutf8
+from modules.hints_matcher import HintsMatcher
+# numpy is imported on the first parsed DEX (not when the APK menu is loaded)
+
+DEX_MAGIC = b"dex\n"
+HEADER_SIZE = 0x70
+
+# classes.dex, classes2.dex, ... in the root of the APK
+DEX_NAME = re.compile(r"^classes\d*\.dex$")
+
+# Code units of each Dalvik instruction, by opcode (the payloads of the switches and arrays have a variable size)
+INSTRUCTION_UNITS = [1] * 256
+for _opcodes, _units in (
+        ([0x02, 0x05, 0x08, 0x13, 0x15, 0x16, 0x19, 0x1a, 0x1c, 0x1f, 0x20, 0x22, 0x23, 0x29, 0xfe, 0xff]
+         + list(range(0x2d, 0x3e)) + list(range(0x44, 0x6e)) + list(range(0x90, 0xb0)) + list(range(0xd0, 0xe3)), 2),
+        ([0x03, 0x06, 0x09, 0x14, 0x17, 0x1b, 0x24, 0x25, 0x26, 0x2a, 0x2b, 0x2c, 0xfc, 0xfd]
+         + list(range(0x6e, 0x73)) + list(range(0x74, 0x79)), 3),
+        ([0xfa, 0xfb], 4),
+        ([0x18], 5)):
+    for _opcode in _opcodes:
+        INSTRUCTION_UNITS[_opcode] = _units
+
+CONST_STRING = 0x1a
+CONST_STRING_JUMBO = 0x1b
+
+# Types of the encoded values (static values of the classes)
+VALUE_STRING = 0x17
+VALUE_ARRAY = 0x1c
+VALUE_ANNOTATION = 0x1d
+VALUE_NULL = 0x1e
+VALUE_BOOLEAN = 0x1f
+
+class DexError(Exception):
+    """
+    The content is not a valid DEX file.
+    """
+
+def read_uleb128(data, offset):
+    """
+    Read an unsigned LEB128 value.
+
+    Args:
+        data (bytes): The content.
+        offset (int): Offset of the value.
+
+    Returns:
+        tuple: (value, offset after the value)
+
+    Raises:
+        IndexError: If the value is truncated.
+    """
+    value = 0
+    shift = 0
+
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def class_name(descriptor):
+    """
+    Java name of a type descriptor (e.g. "Lcom/example/Foo;" -> "com.example.Foo", arrays as their element type).
+
+    Args:
+        descriptor (str): The type descriptor.
+
+    Returns:
+        str: The class name (the descriptor itself for the primitive types).
+    """
+    descriptor = descriptor.lstrip("[")
+    if descriptor.startswith("L") and descriptor.endswith(";"):
+        return descriptor[1:-1].replace("/", ".")
+    return descriptor
+
+class DexFile():
+    def __init__(self, data, name="classes.dex"):
+        """
+        Reader of the string pool and of the class, method and field tables of a DEX file
+        (the code is only decoded to find the classes using a string).
+
+        Args:
+            data (bytes): Content of the DEX file.
+            name (str): Name of the DEX file in the APK.
+
+        Raises:
+            DexError: If the content is not a DEX file.
+        """
+        import numpy as np
+        if len(data) < HEADER_SIZE or not data.startswith(DEX_MAGIC):
+            raise DexError(f"{name} is not a DEX file")
+
+        self.data = data
+        self.name = name
+
+        (string_ids_size, string_ids_off, type_ids_size, type_ids_off, _, _,
+         field_ids_size, field_ids_off, method_ids_size, method_ids_off,
+         class_defs_size, class_defs_off) = struct.unpack_from("<12I", data, 0x38)
+
+        try:
+            self._string_offsets = np.frombuffer(data, dtype="<u4", count=string_ids_size, offset=string_ids_off)
+            self._type_descriptors = np.frombuffer(data, dtype="<u4", count=type_ids_size, offset=type_ids_off)
+            # class_idx, type_idx (field) or proto_idx (method), name_idx
+            member_dtype = np.dtype([("class_idx", "<u2"), ("type_idx", "<u2"), ("name_idx", "<u4")])
+            self._fields = np.frombuffer(data, dtype=member_dtype, count=field_ids_size, offset=field_ids_off)
+            self._methods = np.frombuffer(data, dtype=member_dtype, count=method_ids_size, offset=method_ids_off)
+            class_dtype = np.dtype([("class_idx", "<u4"), ("access_flags", "<u4"), ("superclass_idx", "<u4"),
+                                    ("interfaces_off", "<u4"), ("source_file_idx", "<u4"), ("annotations_off", "<u4"),
+                                    ("class_data_off", "<u4"), ("static_values_off", "<u4")])
+            self._class_defs = np.frombuffer(data, dtype=class_dtype, count=class_defs_size, offset=class_defs_off)
+        except ValueError:
+            raise DexError(f"{name} has tables out of the file")
+
+        self._strings = [None] * string_ids_size
+        # (start of the instructions, end of the instructions, class_idx) of each method with code, sorted
+        self._code_items = None
+        self._code_starts = None
+
+    def string(self, string_idx):
+        """
+        String of the string pool (the invalid MUTF-8 sequences are replaced).
+
+        Args:
+            string_idx (int): Index in the string pool.
+
+        Returns:
+            str: The string.
+
+        Raises:
+            DexError: If the string is out of the file.
+        """
+        try:
+            string = self._strings[string_idx]
+            if string is None:
+                # string_data_item: UTF-16 size (uleb128) and the NUL terminated MUTF-8 bytes
+                _, start = read_uleb128(self.data, int(self._string_offsets[string_idx]))
+        except (IndexError, struct.error) as e:
+            # Truncated string section or index out of the string pool
+            raise DexError(f"{self.name} has an invalid string {string_idx}: {e}")
+
+        if string is None:
+            end = self.data.find(b"\x00", start)
+            raw = self.data[start:end if end != -1 else len(self.data)]
+            try:
+                string = decode_mutf8(raw)
+            except UnicodeDecodeError:
+                string = raw.decode("utf-8", errors="replace")
+            self._strings[string_idx] = string
+
+        return string
+
+    def strings(self):
+        """
+        All the strings of the string pool (literals, type descriptors, method and field names).
+
+        Yields:
+            tuple: (string index, string)
+        """
+        for string_idx in range(len(self._strings)):
+            yield string_idx, self.string(string_idx)
+
+    def type_name(self, type_idx):
+        """
+        Java name of a type.
+
+        Args:
+            type_idx (int): Index in the type table.
+
+        Returns:
+            str: The class name.
+
+        Raises:
+            DexError: If the type or its descriptor is out of the file.
+        """
+        try:
+            descriptor_idx = int(self._type_descriptors[type_idx])
+        except IndexError as e:
+            raise DexError(f"{self.name} has an invalid type {type_idx}: {e}")
+
+        return class_name(self.string(descriptor_idx))
+
+    def string_classes(self, string_indexes):
+        """
+        Classes using each string: the classes described by it, declaring a method or field named by it,
+        loading it with const-string or having it in their static values.
+
+        Args:
+            string_indexes (iterable): Indexes in the string pool.
+
+        Returns:
+            dict: String index -> sorted list of class names (empty if no class uses it).
+        """
+        import numpy as np
+        wanted = set(string_indexes)
+        classes = {string_idx: set() for string_idx in wanted}
+        if not wanted:
+            return {}
+
+        # Type descriptors
+        for type_idx, descriptor_idx in enumerate(self._type_descriptors.tolist()):
+            if descriptor_idx in wanted:
+                classes[descriptor_idx].add(type_idx)
+
+        # Method and field names
+        wanted_array = np.fromiter(wanted, dtype=np.uint32)
+        for members in (self._methods, self._fields):
+            named = members[np.isin(members["name_idx"], wanted_array)]
+            for class_idx, name_idx in zip(named["class_idx"].tolist(), named["name_idx"].tolist()):
+                classes[name_idx].add(class_idx)
+
+        # Static values
+        for class_idx, static_values_off in zip(self._class_defs["class_idx"].tolist(), self._class_defs["static_values_off"].tolist()):
+            if static_values_off:
+                for string_idx in self._encoded_array_strings(static_values_off):
+                    if string_idx in wanted:
+                        classes[string_idx].add(class_idx)
+
+        # Code
+        for string_idx, class_idx in self._const_string_users(wanted_array):
+            classes[string_idx].add(class_idx)
+
+        return {string_idx: sorted(set(self.type_name(type_idx) for type_idx in type_indexes))
+                for string_idx, type_indexes in classes.items()}
+
+    def _encoded_value_strings(self, offset, strings):
+        # Strings of an encoded value (appended to strings), offset after the value
+        header = self.data[offset]
+        offset += 1
+        value_type, value_arg = header & 0x1f, header >> 5
+
+        if value_type == VALUE_STRING:
+            strings.append(int.from_bytes(self.data[offset:offset + value_arg + 1], "little"))
+        elif value_type == VALUE_ARRAY:
+            return self._encoded_array_values(offset, strings)
+        elif value_type == VALUE_ANNOTATION:
+            _, offset = read_uleb128(self.data, offset)
+            size, offset = read_uleb128(self.data, offset)
+            for _ in range(size):
+                _, offset = read_uleb128(self.data, offset)
+                offset = self._encoded_value_strings(offset, strings)
+            return offset
+        elif value_type in (VALUE_NULL, VALUE_BOOLEAN):
+            return offset
+
+        return offset + value_arg + 1
+
+    def _encoded_array_values(self, offset, strings):
+        size, offset = read_uleb128(self.data, offset)
+        for _ in range(size):
+            offset = self._encoded_value_strings(offset, strings)
+        return offset
+
+    def _encoded_array_strings(self, offset):
+        """
+        Strings of an encoded array (e.g. the static values of a class).
+
+        Args:
+            offset (int): Offset of the encoded_array_item.
+
+        Returns:
+            list: String indexes.
+        """
+        strings = []
+        try:
+            self._encoded_array_values(offset, strings)
+        except IndexError:
+            pass
+        return strings
+
+    def _load_code_items(self):
+        # Instructions of every method with code, from the class data of each class
+        code_items = []
+
+        for class_idx, class_data_off in zip(self._class_defs["class_idx"].tolist(), self._class_defs["class_data_off"].tolist()):
+            if not class_data_off:
+                continue
+
+            try:
+                offset = class_data_off
+                sizes = []
+                for _ in range(4):
+                    size, offset = read_uleb128(self.data, offset)
+                    sizes.append(size)
+                static_fields, instance_fields, direct_methods, virtual_methods = sizes
+
+                # Fields: field_idx_diff and access_flags
+                for _ in range(2 * (static_fields + instance_fields)):
+                    _, offset = read_uleb128(self.data, offset)
+
+                # Methods: method_idx_diff, access_flags and code_off
+                for _ in range(direct_methods + virtual_methods):
+                    _, offset = read_uleb128(self.data, offset)
+                    _, offset = read_uleb128(self.data, offset)
+                    code_off, offset = read_uleb128(self.data, offset)
+                    if code_off:
+                        insns_size = struct.unpack_from("<I", self.data, code_off + 12)[0]
+                        code_items.append((code_off + 16, code_off + 16 + 2 * insns_size, class_idx))
+            except (IndexError, struct.error):
+                # Truncated class data: the methods read so far are kept
+                continue
+
+        code_items.sort()
+        self._code_items = code_items
+        self._code_starts = [start for start, _, _ in code_items]
+
+    def _decode_const_strings(self, start, end):
+        """
+        Strings loaded by the const-string instructions of a method.
+
+        Args:
+            start (int): Offset of the instructions.
+            end (int): End of the instructions.
+
+        Returns:
+            set: String indexes.
+        """
+        strings = set()
+        data = self.data
+        offset = start
+
+        while offset < end:
+            opcode = data[offset]
+
+            if opcode == 0 and data[offset + 1]:
+                # Payload pseudo-instructions (packed-switch, sparse-switch, fill-array-data)
+                ident = data[offset + 1]
+                size = struct.unpack_from("<H", data, offset + 2)[0]
+                if ident == 1:
+                    units = 4 + size * 2
+                elif ident == 2:
+                    units = 2 + size * 4
+                elif ident == 3:
+                    units = 4 + (struct.unpack_from("<I", data, offset + 4)[0] * size + 1) // 2
+                else:
+                    units = 1
+            elif opcode == CONST_STRING:
+                strings.add(struct.unpack_from("<H", data, offset + 2)[0])
+                units = 2
+            elif opcode == CONST_STRING_JUMBO:
+                strings.add(struct.unpack_from("<I", data, offset + 2)[0])
+                units = 3
+            else:
+                units = INSTRUCTION_UNITS[opcode]
+
+            offset += 2 * units
+
+        return strings
+
+    def _const_string_users(self, string_indexes):
+        """
+        Classes loading some strings with const-string: the code units that could be a const-string of one of them
+        are found on the whole content at once, then only the methods including them are decoded.
+
+        Args:
+            string_indexes (numpy.ndarray): String indexes (uint32).
+
+        Returns:
+            set: (string index, class_idx) couples.
+        """
+        import numpy as np
+        if self._code_items is None:
+            self._load_code_items()
+        if not self._code_items:
+            return set()
+
+        # The instructions are aligned to code units (2 bytes)
+        units = np.frombuffer(self.data, dtype="<u2", count=len(self.data) // 2)
+        opcodes = units[:-2] & 0xff
+        candidates = np.flatnonzero((opcodes == CONST_STRING) & np.isin(units[1:-1], string_indexes))
+        jumbo = (units[1:-1].astype(np.uint32) | (units[2:].astype(np.uint32) << 16))
+        candidates = np.union1d(candidates, np.flatnonzero((opcodes == CONST_STRING_JUMBO) & np.isin(jumbo, string_indexes)))
+        del units, opcodes, jumbo
+
+        wanted = set(string_indexes.tolist())
+        users = set()
+        checked = set()
+        for offset in (2 * candidates).tolist():
+            position = bisect_right(self._code_starts, offset) - 1
+            if position < 0 or position in checked or offset >= self._code_items[position][1]:
+                continue
+            checked.add(position)
+
+            start, end, class_idx = self._code_items[position]
+            try:
+                users.update((string_idx, class_idx) for string_idx in self._decode_const_strings(start, end) & wanted)
+            except (IndexError, struct.error):
+                # Truncated code
+                continue
+
+        return users
+
+def dex_files(apk_filepath):
+    """
+    DEX files of an APK (classes.dex, classes2.dex, ...).
+
+    Args:
+        apk_filepath (str): Path of the APK.
+
+    Yields:
+        DexFile: Each DEX file, in the order of the APK.
+
+    Raises:
+        zipfile.BadZipFile: If the APK can't be opened.
+        DexError: If a DEX file can't be read or is not a DEX file.
+    """
+    with zipfile.ZipFile(apk_filepath) as apk:
+        names = sorted((name for name in apk.namelist() if DEX_NAME.match(name)),
+                       key=lambda name: int(name[7:-4] or 1))
+        for name in names:
+            try:
+                data = apk.read(name)
+            except (zlib.error, EOFError, NotImplementedError) as e:
+                # Corrupted or unsupported compression of the DEX file
+                raise DexError(f"{name} can't be read: {e}")
+            yield DexFile(data, name)
+
+def dex_hints(apk_filepath, rules, features):
+    """
+    Run the APK analysis checks (see APK_ANALYSIS_DICT) on the string pool of the DEX files of an APK,
+    without decompiling it. The strings include the literals of the code and the class, method and field names.
+
+    Args:
+        apk_filepath (str): Path of the APK.
+        rules (dict): Feature -> check type -> list of regexes (the rules of the smali files).
+        features (list): Features to be checked.
+
+    Yields:
+        tuple: (DEX name, feature, check type, regex source, class names using the string, string)
+               of each hit, a DEX file at a time.
+
+    Raises:
+        zipfile.BadZipFile: If the APK can't be opened.
+        DexError: If a DEX file is not valid.
+    """
+    matcher = HintsMatcher(rules, features)
+
+    for dex in dex_files(apk_filepath):
+        hits = [(string_idx, hint) for string_idx, string in dex.strings() for hint in matcher.search(string)]
+        classes = dex.string_classes(string_idx for string_idx, _ in hits)
+
+        for string_idx, (feature, check_type, check) in hits:
+            yield dex.name, feature, check_type, check, classes[string_idx], dex.string(string_idx)
@@ -0,0 +1,224 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import regex
+
+# Encodings of the strings found in the APK files:
+# UTF-8 (text files), MUTF-8 (DEX and Java class files), UTF-16 (resources.arsc, Windows-built assets, native libraries)
+UTF8 = "UTF-8"
+MUTF8 = "MUTF-8"
+UTF16LE = "UTF-16LE"
+UTF16BE = "UTF-16BE"
+
+# Min characters of a UTF-16 string scanned by the secrets search
+MIN_UTF16_CHARS = 8
+# Max characters read around a UTF-16 occurrence to find the ends of its string
+MAX_UTF16_WALK = 4096
+
+# Printable ASCII characters (the secrets are ASCII)
+_PRINTABLE = rb"[\t\n\r\x20-\x7e]"
+# Printable characters alternated with NUL bytes: the ASCII text encoded as UTF-16LE or UTF-16BE
+# (the same bytes can be read in both ways, one character apart, so the parity is not fixed)
+_UTF16_REGION = regex.compile(rb"\x00?(?:" + _PRINTABLE + rb"\x00){" + str(MIN_UTF16_CHARS - 1).encode() + rb",}" + _PRINTABLE + rb"?")
+_PRINTABLE_BYTES = frozenset(b"\t\n\r" + bytes(range(0x20, 0x7f)))
+
+def encode_mutf8(text):
+    """
+    Encode a string as Modified UTF-8 (NUL as C0 80, supplementary characters as CESU-8 surrogate pairs).
+
+    Args:
+        text (str): The string.
+
+    Returns:
+        bytes: The encoded string.
+    """
+    utf16 = text.encode("utf-16-le", "surrogatepass")
+    units = "".join(chr(int.from_bytes(utf16[i:i + 2], "little")) for i in range(0, len(utf16), 2))
+
+    return units.encode("utf-8", "surrogatepass").replace(b"\x00", b"\xc0\x80")
+
+def decode_mutf8(data):
+    """
+    Decode a Modified UTF-8 byte sequence.
+
+    Args:
+        data (bytes): The encoded string.
+
+    Returns:
+        str: The decoded string.
+
+    Raises:
+        UnicodeDecodeError: If the bytes are not valid MUTF-8.
+    """
+    units = data.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+    # Surrogate pairs joined into the supplementary characters (unpaired surrogates are invalid)
+    return units.encode("utf-16-le", "surrogatepass").decode("utf-16-le")
+
+def text_variants(text):
+    """
+    Encodings of a string that differ from its UTF-8 encoding.
+
+    Args:
+        text (str): The string.
+
+    Returns:
+        list: (encoding, bytes) couples (UTF-16LE, UTF-16BE and MUTF-8 if different from UTF-8).
+    """
+    variants = [(UTF16LE, text.encode("utf-16-le", "surrogatepass")), (UTF16BE, text.encode("utf-16-be", "surrogatepass"))]
+
+    mutf8 = encode_mutf8(text)
+    if mutf8 != text.encode("utf-8", "surrogatepass"):
+        variants.append((MUTF8, mutf8))
+
+    return variants
+
+def utf16_shifted(variant):
+    """
+    Check if the UTF-16LE encoding of a string, read one byte earlier, is its UTF-16BE encoding
+    (only characters up to U+00FF, the high bytes are NUL): the same occurrence matches both variants.
+
+    Args:
+        variant (bytes): UTF-16LE or UTF-16BE encoding of the string.
+
+    Returns:
+        bool: True if the two variants can match the same occurrence.
+    """
+    return len(variant) >= 2 and (not any(variant[1::2]) or not any(variant[0::2]))
+
+def utf16_encoding(buffer, first_char, last_char):
+    """
+    Endianness of a UTF-16 occurrence of a utf16_shifted string, decided as in utf16_runs:
+    NUL before the characters of its string is big endian, NUL after them is little endian
+    (a NUL at both ends can't be decided, little endian is by far the most common).
+
+    Args:
+        buffer (mmap.mmap or bytes): The content.
+        first_char (int): Offset of the first character (the non NUL byte) of the occurrence.
+        last_char (int): Offset of the last character of the occurrence.
+
+    Returns:
+        str: UTF16LE or UTF16BE.
+    """
+    size = len(buffer)
+
+    # Ends of the string: characters 2 bytes apart with a NUL between them
+    start = first_char
+    while first_char - start < 2 * MAX_UTF16_WALK and start >= 2 and buffer[start - 1] == 0 and buffer[start - 2] != 0:
+        start -= 2
+
+    end = last_char
+    while end - last_char < 2 * MAX_UTF16_WALK and end + 2 < size and buffer[end + 1] == 0 and buffer[end + 2] != 0:
+        end += 2
+
+    nul_before = start > 0 and buffer[start - 1] == 0
+    nul_after = end + 1 < size and buffer[end + 1] == 0
+
+    return UTF16BE if nul_before and not nul_after else UTF16LE
+
+def utf16_duplicate(buffer, match_start, match_end, encoding):
+    """
+    Check if a UTF-16 occurrence of a utf16_shifted string is the same text of an occurrence
+    of the other endianness, one byte apart (e.g. the UTF-16BE match of a UTF-16LE text).
+
+    Args:
+        buffer (mmap.mmap or bytes): The content.
+        match_start (int): Start of the occurrence.
+        match_end (int): End of the occurrence.
+        encoding (str): UTF16LE or UTF16BE, the encoding of the found variant.
+
+    Returns:
+        bool: True if the occurrence has to be dropped (its text has the other endianness).
+    """
+    # Characters at the even offsets of a little endian occurrence, at the odd ones of a big endian one
+    shift = 1 if encoding == UTF16BE else 0
+    return utf16_encoding(buffer, match_start + shift, match_end - 2 + shift) != encoding
+
+def decode_text(found_bytes, encoding):
+    """
+    Decode found bytes back to text.
+
+    Args:
+        found_bytes (bytes): The found bytes.
+        encoding (str): Encoding of the found bytes.
+
+    Returns:
+        tuple: (found string, encoding) where the encoding is MUTF-8 for the UTF-8 bytes valid only as MUTF-8.
+
+    Raises:
+        UnicodeDecodeError: If the bytes can't be decoded.
+    """
+    if encoding == UTF16LE:
+        return found_bytes.decode("utf-16-le"), encoding
+    if encoding == UTF16BE:
+        return found_bytes.decode("utf-16-be"), encoding
+    if encoding == MUTF8:
+        return decode_mutf8(found_bytes), encoding
+
+    try:
+        return found_bytes.decode("utf-8"), encoding
+    except UnicodeDecodeError:
+        return decode_mutf8(found_bytes), MUTF8
+
+def decode_found(found_bytes, encoding):
+    """
+    Decode found bytes back to text (as a 0x<hex> string if they can't be decoded).
+
+    Args:
+        found_bytes (bytes): The found bytes.
+        encoding (str): Encoding of the found bytes.
+
+    Returns:
+        tuple: (found string, encoding), see decode_text.
+    """
+    try:
+        return decode_text(found_bytes, encoding)
+    except UnicodeDecodeError:
+        return f"0x{found_bytes.hex()}", encoding
+
+def utf16_runs(buffer, start, end, report_end, min_offset=0):
+    """
+    Find the UTF-16 strings of printable ASCII characters starting in a window of the content.
+    A string crossing the end of the window is read up to its end.
+
+    Args:
+        buffer (mmap.mmap or bytes): The content.
+        start (int): Start of the window.
+        end (int): End of the window (overlap included).
+        report_end (int): Strings starting from this offset are left to the next window.
+        min_offset (int): Strings starting before this offset are ignored (they belong to a previous byte range).
+
+    Yields:
+        tuple: (encoding, offset of the first character, ASCII bytes of the string)
+               where the characters are 2 bytes apart in the content.
+    """
+    # No NUL bytes, no UTF-16 text (e.g. smali and JS files)
+    if buffer.find(b"\x00", start, end) == -1:
+        return
+
+    for match in _UTF16_REGION.finditer(buffer, start, end):
+        region_start = match.start()
+        if region_start >= report_end:
+            break
+        if region_start < min_offset:
+            continue
+
+        # Continuation of a string of the previous window
+        if region_start == start and start > 0 and (buffer[start - 1] == 0) != (buffer[start] == 0) \
+                and buffer[start - 1 if buffer[start] == 0 else start] in _PRINTABLE_BYTES:
+            continue
+
+        region_end = match.end()
+        if region_end == end:
+            # The string continues after the window
+            region_end = _UTF16_REGION.match(buffer, region_start).end()
+
+        region = buffer[region_start:region_end]
+        first = 1 if region[0] == 0 else 0
+        # NUL before the characters: big endian, NUL after the characters: little endian
+        # (a printable byte at both ends can't be decided, little endian is by far the most common)
+        encoding = UTF16BE if first else UTF16LE
+
+        yield encoding, region_start + first, region[first::2]
@@ -0,0 +1,179 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import math
+# numpy is imported by the detector methods (not at the start of the CLI)
+
+# Length of the tokens evaluated by the detector
+# (longer runs are usually embedded data, e.g. base64 images or certificates)
+MIN_TOKEN_LENGTH = 20
+MAX_TOKEN_LENGTH = 128
+# A token is reported if its entropy is at least ENTROPY_RATIO times
+# the expected entropy of a random token with the same length and alphabet
+ENTROPY_RATIO = 0.9
+
+# Token classes: (pattern name, alphabet, alphabet size of a random token, min length, mixed case required)
+TOKEN_CLASSES = [
+    ("High Entropy String (base64)", b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/-_", 64, MIN_TOKEN_LENGTH, True),
+    ("High Entropy String (hex)", b"0123456789abcdefABCDEF", 16, 32, False),
+]
+
+_DIGITS = b"0123456789"
+_UPPER = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_LOWER = b"abcdefghijklmnopqrstuvwxyz"
+_HEX = b"0123456789abcdefABCDEF"
+
+def expected_entropy(length, alphabet_size):
+    """
+    Expected Shannon entropy (bits per symbol) of a uniformly random token.
+
+    Args:
+        length (int): Length of the token.
+        alphabet_size (int): Number of symbols of the alphabet.
+
+    Returns:
+        float: Expected entropy.
+    """
+    # Each symbol occurs x times with x ~ Binomial(length, 1/alphabet_size)
+    p = 1 / alphabet_size
+    entropy = 0.0
+    for x in range(1, length + 1):
+        probability = math.comb(length, x) * p**x * (1 - p)**(length - x)
+        entropy -= probability * (x / length) * math.log2(x / length)
+
+    return alphabet_size * entropy
+
+def is_path(token):
+    """
+    Check if a token is a class or file path (e.g. Lokhttp3/internal/http2/b) instead of a secret.
+
+    Args:
+        token (bytes): The token.
+
+    Returns:
+        bool: True if the token looks like a path.
+    """
+    segments = token.lstrip(b"L").split(b"/")
+    # Package-like segments (lowercase), random base64 has mixed case segments
+    return len(segments) > 2 and all(segment == segment.lower() for segment in segments[:-1])
+
+class EntropyDetector():
+    def __init__(self):
+        """
+        Detector of high-entropy tokens (base64/hex-like strings not covered by the vendor patterns).
+        """
+        import numpy as np
+        self.classes = []
+        digits, upper, lower = (np.frombuffer(chars, dtype=np.uint8) for chars in (_DIGITS, _UPPER, _LOWER))
+
+        # Bytes of the hex alphabet
+        self._hex_only = np.zeros(256, dtype=bool)
+        self._hex_only[np.frombuffer(_HEX, dtype=np.uint8)] = True
+
+        for name, alphabet, alphabet_size, min_length, mixed_case in TOKEN_CLASSES:
+            symbols = np.frombuffer(alphabet, dtype=np.uint8)
+
+            # Byte -> symbol index (len(alphabet) for the bytes out of the alphabet)
+            table = np.full(256, len(alphabet), dtype=np.uint16)
+            table[symbols] = np.arange(len(alphabet), dtype=np.uint16)
+
+            # Min entropy of a reported token, for each length
+            thresholds = np.zeros(MAX_TOKEN_LENGTH + 1)
+            for length in range(min_length, MAX_TOKEN_LENGTH + 1):
+                thresholds[length] = ENTROPY_RATIO * expected_entropy(length, alphabet_size)
+
+            self.classes.append({
+                "name": name,
+                "alphabet_length": len(alphabet),
+                "table": table,
+                "min_length": min_length,
+                "thresholds": thresholds,
+                "mixed_case": mixed_case,
+                "digits": table[digits],
+                "upper": table[np.intersect1d(upper, symbols)],
+                "lower": table[np.intersect1d(lower, symbols)],
+                # The hex tokens are reported by the hex class
+                "skip_hex": mixed_case,
+            })
+
+    def version(self):
+        """
+        Parameters of the detector (part of the rule set version of the scan cache).
+
+        Returns:
+            str: Description of the parameters.
+        """
+        return f"entropy:{MIN_TOKEN_LENGTH}:{MAX_TOKEN_LENGTH}:{ENTROPY_RATIO}:" + ",".join(
+            f"{name}:{alphabet!r}:{size}:{length}:{mixed}" for name, alphabet, size, length, mixed in TOKEN_CLASSES)
+
+    def scan(self, buffer, start, end, report_end):
+        """
+        Find the high-entropy tokens of a window of the content.
+        The entropy of all the candidate tokens is computed at once, from the symbol histograms
+        of the tokens (no Python loop over the tokens).
+
+        Args:
+            buffer (mmap.mmap or bytes): Content of the file.
+            start (int): Start of the window.
+            end (int): End of the window (overlap included).
+            report_end (int): Tokens starting from this offset are left to the next window.
+
+        Returns:
+            list: (pattern name, token start, token end) with absolute offsets.
+        """
+        import numpy as np
+        data = np.frombuffer(buffer[start:end], dtype=np.uint8)
+        found = []
+
+        for token_class in self.classes:
+            symbols = token_class["table"][data]
+            in_alphabet = symbols < token_class["alphabet_length"]
+
+            # Runs of symbols of the alphabet
+            edges = np.flatnonzero(np.diff(np.concatenate(([False], in_alphabet, [False])).view(np.int8)))
+            starts, ends = edges[::2], edges[1::2]
+
+            lengths = ends - starts
+            keep = (lengths >= token_class["min_length"]) & (lengths <= MAX_TOKEN_LENGTH) & (starts + start < report_end)
+            # A run cut by the end of the window is too long anyway (the overlap is longer than MAX_TOKEN_LENGTH),
+            # a run at the beginning of the window is the end of a run of the previous window
+            keep &= (ends < len(data)) | (end == len(buffer))
+            if start > 0:
+                keep &= (starts > 0) | (token_class["table"][buffer[start - 1]] == token_class["alphabet_length"])
+            starts, ends, lengths = starts[keep], ends[keep], lengths[keep]
+            if not len(starts):
+                continue
+
+            # Symbols of all the tokens, labelled with the index of their token
+            token_ids = np.repeat(np.arange(len(starts)), lengths)
+            positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+            alphabet_length = token_class["alphabet_length"]
+            counts = np.bincount(token_ids * alphabet_length + symbols[positions],
+                                 minlength=len(starts) * alphabet_length).reshape(len(starts), alphabet_length)
+
+            # Shannon entropy of each token
+            p = counts / lengths[:, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                entropy = -np.where(counts > 0, p * np.log2(p), 0.0).sum(axis=1)
+
+            selected = entropy >= token_class["thresholds"][lengths]
+            # Secrets mix digits and letters (filters most of the identifiers and words)
+            upper = counts[:, token_class["upper"]].sum(axis=1)
+            lower = counts[:, token_class["lower"]].sum(axis=1)
+            selected &= counts[:, token_class["digits"]].sum(axis=1) > 0
+            if token_class["mixed_case"]:
+                selected &= (upper > 0) & (lower > 0)
+            else:
+                selected &= (upper + lower) > 0
+
+            for token_start, token_end in zip(starts[selected], ends[selected]):
+                if token_class["skip_hex"] and self._hex_only[data[token_start:token_end]].all():
+                    continue
+                if is_path(bytes(data[token_start:token_end])):
+                    continue
+                found.append((token_class["name"], start + int(token_start), start + int(token_end)))
+
+        return found
@@ -0,0 +1,227 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import argparse
+import fnmatch
+import os
+import platform
+import shlex
+from tabulate import tabulate
+from termcolor import colored
+from modules.archive_reader import is_archive, iter_archive_members, open_archive, read_header
+
+if platform.system() != "Windows":
+    import magic
+else:
+    magic = None
+
+# Content types that can't hold a useful secret (detected by libmagic)
+SKIPPED_MIME_PREFIXES = ("image/", "audio/", "video/", "font/")
+SKIPPED_MIME_TYPES = {"application/vnd.ms-opentype", "application/vnd.ms-fontobject",
+                      "application/font-sfnt", "application/font-woff", "application/x-font-ttf"}
+# Bytes read from the beginning of a file to detect its type
+MAGIC_HEADER_SIZE = 4096
+# Text and code files (most of a decompiled APK), accepted without reading their header
+TEXT_EXTENSIONS = {".smali", ".xml", ".java", ".kt", ".js", ".json", ".txt", ".html", ".htm", ".css",
+                   ".properties", ".yml", ".yaml", ".cfg", ".ini", ".conf", ".md", ".csv", ".sql",
+                   ".c", ".cpp", ".h", ".py", ".sh", ".gradle", ".pro", ".dart", ".ts", ".plist"}
+
+class FileFilter():
+    def __init__(self, include=None, exclude=None, max_size=None, skip_media=True):
+        """
+        Filter of the files to be scanned.
+
+        Args:
+            include (list): Glob patterns of the files to be scanned (all the files if empty).
+            exclude (list): Glob patterns of the files to be skipped.
+            max_size (int): Files larger than max_size bytes are skipped (no limit if None).
+            skip_media (bool): Skip images, audio, video and fonts (detected by libmagic, except for the TEXT_EXTENSIONS files).
+        """
+        self.include = include or []
+        self.exclude = exclude or []
+        self.max_size = max_size
+        self.skip_media = skip_media and magic is not None
+
+        # Counters of the skipped files, by reason
+        self.skipped = {}
+        self.skipped_bytes = {}
+
+        self._magic = magic.Magic(mime=True) if self.skip_media else None
+
+    def _matches(self, patterns, relpath, name):
+        # A glob matches the file name or its path relative to the target folder
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(relpath, p) for p in patterns)
+
+    def _skip(self, reason, size):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        self.skipped_bytes[reason] = self.skipped_bytes.get(reason, 0) + size
+
+    def _mime_type(self, filepath):
+        try:
+            return self._magic.from_buffer(read_header(filepath, MAGIC_HEADER_SIZE))
+        except Exception:
+            # Unreadable or unknown files are left to the scan functions
+            return ""
+
+    def accept(self, filepath, relpath, size):
+        """
+        Check if a file has to be scanned (counting the skipped ones).
+
+        Args:
+            filepath (str): Path of the file.
+            relpath (str): Path of the file relative to the target folder.
+            size (int): Size of the file.
+
+        Returns:
+            bool: True if the file has to be scanned.
+        """
+        name = os.path.basename(filepath)
+
+        if self.include and not self._matches(self.include, relpath, name):
+            self._skip("not included", size)
+            return False
+
+        if self.exclude and self._matches(self.exclude, relpath, name):
+            self._skip("excluded", size)
+            return False
+
+        if self.max_size is not None and size > self.max_size:
+            self._skip("too large", size)
+            return False
+
+        if self.skip_media and size and os.path.splitext(name)[1].lower() not in TEXT_EXTENSIONS:
+            mime_type = self._mime_type(filepath)
+            if mime_type.startswith(SKIPPED_MIME_PREFIXES) or mime_type in SKIPPED_MIME_TYPES:
+                self._skip(mime_type, size)
+                return False
+
+        return True
+
+    def print_report(self):
+        """
+        Print the number and size of the skipped files, by reason.
+        """
+        if not self.skipped:
+            return
+
+        rows = [[colored(reason, "green"), colored(count, "yellow"), f"{self.skipped_bytes[reason] / (1024 * 1024):.1f}"]
+                for reason, count in sorted(self.skipped.items())]
+
+        print("\n" + colored("=== SKIPPED FILES ===", "magenta", attrs=["bold"]))
+        print(tabulate(rows, headers=[colored("Reason", "red"), colored("Files", "red"), colored("MB", "red")], tablefmt='fancy_grid', colalign=('left', 'center', 'center')))
+
+def walk_archive(target_path, archive_path, file_filter=None):
+    """
+    Lazily list the members of an archive (and of the nested ones), yielding only the ones accepted by the filter.
+
+    Args:
+        target_path (str): File or folder being walked.
+        archive_path (str): Path of the archive.
+        file_filter (FileFilter): Filter of the members (all the members if None).
+
+    Yields:
+        tuple: (target path, archive!member path) couples.
+    """
+    try:
+        open_archive(archive_path)
+    except IOError:
+        # Not a valid archive, scanned as a regular file
+        if not file_filter or file_filter.accept(archive_path, os.path.relpath(archive_path, target_path), os.path.getsize(archive_path)):
+            yield (target_path, archive_path)
+        return
+
+    for member_path, size in iter_archive_members(archive_path):
+        if file_filter and not file_filter.accept(member_path, os.path.relpath(member_path, target_path), size):
+            continue
+
+        yield (target_path, member_path)
+
+def walk_files(target_path, file_filter=None, expand_archives=False):
+    """
+    Lazily walk a file or a folder (recursively), yielding only the files accepted by the filter.
+
+    Args:
+        target_path (str): File or folder to be walked.
+        file_filter (FileFilter): Filter of the files (all the files if None).
+        expand_archives (bool): Yield the members of the archives (APK, AAB, JAR, ZIP, ...) instead of the archives.
+
+    Yields:
+        tuple: (target path, file path) couples (archive!member paths for the archive members).
+    """
+    if not os.path.isdir(target_path):
+        if expand_archives and is_archive(target_path):
+            yield from walk_archive(target_path, target_path, file_filter)
+        else:
+            # Single file case (always scanned, it was explicitly requested)
+            yield (target_path, target_path)
+        return
+
+    folders = [target_path]
+    while folders:
+        folder = folders.pop()
+
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    archive_path = None
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            folders.append(entry.path)
+                            continue
+
+                        if not entry.is_file():
+                            continue
+
+                        if expand_archives and is_archive(entry.name):
+                            archive_path = entry.path
+
+                        elif file_filter and not file_filter.accept(entry.path, os.path.relpath(entry.path, target_path), entry.stat().st_size):
+                            continue
+
+                    except OSError:
+                        # Broken links or files removed during the walk
+                        continue
+
+                    if archive_path:
+                        yield from walk_archive(target_path, archive_path, file_filter)
+                    else:
+                        yield (target_path, entry.path)
+
+        except OSError:
+            # Folders that can't be read
+            continue
+
+def parse_target(user_input):
+    """
+    Parse the input of a search: the path, optionally followed by the filter options
+    (--include GLOB, --exclude GLOB, --max-size MB, --all-types).
+
+    Args:
+        user_input (str): Input of the user.
+
+    Returns:
+        tuple: (target path or None if not valid, FileFilter)
+    """
+    if os.path.exists(user_input):
+        return user_input, FileFilter()
+
+    parser = argparse.ArgumentParser(prog="", add_help=False, exit_on_error=False)
+    parser.add_argument("path")
+    parser.add_argument("--include", action="append", default=[])
+    parser.add_argument("--exclude", action="append", default=[])
+    parser.add_argument("--max-size", type=float, default=None)
+    parser.add_argument("--all-types", action="store_true")
+
+    try:
+        args, unknown = parser.parse_known_args(shlex.split(user_input))
+    except (argparse.ArgumentError, ValueError, SystemExit):
+        return None, FileFilter()
+
+    if unknown or not os.path.exists(args.path):
+        return None, FileFilter()
+
+    max_size = int(args.max_size * 1024 * 1024) if args.max_size is not None else None
+    return args.path, FileFilter(args.include, args.exclude, max_size, not args.all_types)
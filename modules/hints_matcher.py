@@ -0,0 +1,279 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import json
+import re
+import time
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Seconds between two progress updates of a worker (each update is an IPC round trip)
+PROGRESS_INTERVAL = 0.1
+
+# Matchers compiled by each worker process, by rule set and features
+_MATCHERS = {}
+
+# Characters with a special meaning in a regex (outside an escape sequence)
+_REGEX_METACHARACTERS = set(".^$*+?{}[]|()\\")
+
+def literal_text(pattern):
+    """
+    Text matched by a regex made only of literal characters and escaped punctuation (e.g. r"okhttp3\\.Request").
+
+    Args:
+        pattern (str): Source of the regex.
+
+    Returns:
+        str: The literal text or None if the regex is not a plain literal.
+    """
+    text = []
+    escaped = False
+
+    for char in pattern:
+        if escaped:
+            # \d, \w, \b, ... are classes or assertions, not literals
+            if char.isalnum():
+                return None
+            text.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in _REGEX_METACHARACTERS:
+            return None
+        else:
+            text.append(char)
+
+    return None if escaped or not text else "".join(text)
+
+def literal_trie(literals):
+    """
+    Regex matching any of the literals, factored by common prefix (the regex engine tries
+    one branch for each distinct character instead of one branch for each literal).
+
+    Args:
+        literals (list): Literal strings.
+
+    Returns:
+        str: Source of the regex.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        # End of a literal: the longer ones with the same prefix don't need to be matched
+        node.clear()
+        node[""] = True
+
+    def branch(node):
+        if "" in node:
+            return ""
+        alternatives = [re.escape(char) + branch(child) for char, child in sorted(node.items())]
+        return alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+
+    return branch(trie)
+
+class HintsMatcher():
+    def __init__(self, rules, features):
+        """
+        Matcher of the checks of an APK analysis rule set (see APK_ANALYSIS_DICT), compiled once.
+        Each line is tested once with the alternation of all the checks (the plain literals merged
+        in a prefix trie): only the few lines with a hit are tested with every check
+        (the plain literals with a substring search). The lines of a whole file are first
+        narrowed down by candidate_lines (the literals with an Aho-Corasick automaton
+        if pyahocorasick is installed).
+
+        Args:
+            rules (dict): Feature -> check type -> list of regexes (the rules of a file format).
+            features (list): Features to be checked (e.g. "Certificate Pinning Hints").
+        """
+        # (feature, check type, regex source, literal text or compiled regex) in the order of the rules
+        self.checks = []
+        literals = set()
+        sources = []
+
+        for feature in rules:
+            if feature not in features:
+                continue
+
+            for check_type in rules[feature]:
+                for check in rules[feature][check_type]:
+                    literal = literal_text(check)
+                    if literal is not None:
+                        self.checks.append((feature, check_type, check, literal))
+                        literals.add(literal)
+                        continue
+
+                    try:
+                        self.checks.append((feature, check_type, check, re.compile(check)))
+                    except re.error:
+                        print(f"ERROR: {check}")
+                        continue
+
+                    if check not in sources:
+                        sources.append(check)
+
+        # All the literals in a single branch factored by common prefix
+        trie = literal_trie(sorted(literals)) if literals else None
+        line_sources = sources + [trie] if trie else sources
+
+        try:
+            self._prefilter = re.compile("|".join(f"(?:{source})" for source in line_sources)) if line_sources else None
+        except re.error:
+            # A check that can't be merged (e.g. global inline flags): every check is tested
+            self._prefilter = None
+
+        # Searches of the bytes of a whole file (^ and $ at each line), run separately as an alternation
+        # is much slower than its branches: each line matching a check is touched by one of their matches
+        # (a match can't be empty). Without them (checks not ASCII) every line is a candidate.
+        self._automaton = None
+        self._file_regexes = None
+        if all(source.isascii() for source in line_sources):
+            try:
+                self._file_regexes = [re.compile(source.encode("ascii"), re.MULTILINE) for source in sources]
+            except re.error:
+                self._file_regexes = None
+
+        if self._file_regexes is not None and literals:
+            if ahocorasick:
+                self._automaton = ahocorasick.Automaton()
+                for literal in literals:
+                    self._automaton.add_word(literal, len(literal))
+                self._automaton.make_automaton()
+            else:
+                self._file_regexes.append(re.compile(trie.encode("ascii"), re.MULTILINE))
+
+    def search(self, line):
+        """
+        Checks matching a line.
+
+        Args:
+            line (str): The line.
+
+        Returns:
+            list: (feature, check type, regex source) of each matching check, in the order of the rules.
+        """
+        if not self.checks or (self._prefilter and not self._prefilter.search(line)):
+            return []
+
+        return [(feature, check_type, check) for feature, check_type, check, matcher in self.checks
+                if (matcher in line if isinstance(matcher, str) else matcher.search(line))]
+
+    def candidate_lines(self, content):
+        """
+        Lines of a whole content that can match a check (the lines touched by a match of the file searches).
+
+        Args:
+            content (bytes): The content, with "\n" newlines.
+
+        Yields:
+            tuple: (line number, bytes of the line with its newline)
+        """
+        line_start = 0
+        line_number = 1
+
+        if not self.checks:
+            return
+
+        if self._file_regexes is None:
+            # Every line is a candidate
+            spans = [(0, len(content))]
+        else:
+            spans = []
+            for file_regex in self._file_regexes:
+                spans.extend(match.span() for match in file_regex.finditer(content))
+            if self._automaton is not None:
+                # latin-1 maps each byte to a single character
+                spans.extend((last + 1 - length, last + 1) for last, length in self._automaton.iter(content.decode('latin-1')))
+            spans.sort()
+
+        for start, end in spans:
+            if end <= line_start:
+                continue
+
+            # Start of the line of the match (after the lines already yielded)
+            if start > line_start:
+                line_number += content.count(b"\n", line_start, start)
+                newline = content.rfind(b"\n", line_start, start)
+                if newline != -1:
+                    line_start = newline + 1
+
+            # A match of the file searches can span more lines (e.g. [^"]+)
+            while line_start < end:
+                line_end = content.find(b"\n", line_start)
+                line_end = len(content) if line_end == -1 else line_end + 1
+                yield line_number, content[line_start:line_end]
+                line_number += 1
+                line_start = line_end
+
+def hints_in_file(target_file, matcher):
+    """
+    Checks matching each line of a text file. The file is read once as bytes and only the lines
+    found by a single search of all the checks on the whole content are decoded and matched.
+    The lines are the ones of a text mode read (universal newlines) and the invalid UTF-8
+    sequences are replaced, so that binary or corrupted files are analyzed too.
+
+    Args:
+        target_file (str): Path of the file (UTF-8).
+        matcher (HintsMatcher): The compiled checks.
+
+    Returns:
+        list: (feature, check type, regex source, line number, stripped line) of each hit, in file order.
+    """
+    hints = []
+
+    with open(target_file, 'rb') as f:
+        content = f.read()
+
+    if b"\r" in content:
+        content = content.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+    for line_number, line in matcher.candidate_lines(content):
+        line = line.decode('utf-8', errors='replace')
+        for feature, check_type, check in matcher.search(line):
+            hints.append((feature, check_type, check, line_number, line.strip()))
+
+    return hints
+
+def hints_in_unit(unit, rules, features, progress):
+    """
+    Run the checks on the files of a work unit (in a worker process), reporting the progress to the main process.
+
+    Args:
+        unit (list): Work unit returned by work_units (file index, (root path, file path), None).
+        rules (dict): Feature -> check type -> list of regexes (the rules of a file format).
+        features (list): Features to be checked.
+        progress (queue.Queue): Receives (number of files completed, last file) at most every PROGRESS_INTERVAL seconds.
+
+    Returns:
+        list: (file index, hints returned by hints_in_file) of each file.
+    """
+    key = json.dumps([rules, features])
+    if key not in _MATCHERS:
+        _MATCHERS[key] = HintsMatcher(rules, features)
+    matcher = _MATCHERS[key]
+
+    results = []
+    completed = 0
+    last_update = time.perf_counter()
+
+    try:
+        for index, (_, target_file), _ in unit:
+            results.append((index, hints_in_file(target_file, matcher)))
+            completed += 1
+
+            if time.perf_counter() - last_update >= PROGRESS_INTERVAL:
+                progress.put((completed, target_file))
+                completed = 0
+                last_update = time.perf_counter()
+    finally:
+        # Also the files of a failed unit are reported, so that the progress bar is completed
+        progress.put((len(unit) - len(results) + completed, unit[-1][1][1]))
+
+    return results
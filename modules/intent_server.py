@@ -10,7 +10,8 @@ from flask import Flask, render_template
 import random
 import os
 from modules.adb import get_session_device_id
-from modules.apk_analyzer import apk_decompiler_from_device, apk_decompiler_from_file
+from modules.apk_analyzer import cached_decompiler_from_device, cached_decompiler_from_file
+from modules.decompile_cache import release_decompiled_apk
 from modules.utility import pc_wifi_ip
 import xml.etree.ElementTree as ET
 from modules.tasks_management import Task
@@ -119,23 +120,38 @@ def custom_urls_server_from_manifest(user_input):
     app.run(debug=False, host=ip_address, port=5000)
 
 def custom_urls_server_from_mobile(user_input):
-    decompiled_folder = apk_decompiler_from_device(user_input)
-    manifest_path = os.path.join(decompiled_folder, "AndroidManifest.xml")
-    
-    if not os.path.exists(manifest_path):
-        print(f"Error: AndroidManifest.xml not found in {decompiled_folder}")
+    decompiled_folder = cached_decompiler_from_device(user_input)
+    if decompiled_folder is None:
+        print("Error: decompilation of the APK failed")
         return
+
+    try:
+        manifest_path = os.path.join(decompiled_folder, "AndroidManifest.xml")
+    
+        if not os.path.exists(manifest_path):
+            print(f"Error: AndroidManifest.xml not found in {decompiled_folder}")
+            return
     
-    custom_urls_server_from_manifest(manifest_path)
+        custom_urls_server_from_manifest(manifest_path)
+    finally:
+        # The cached tree is read until the server stops
+        release_decompiled_apk(decompiled_folder)
 
 def custom_urls_server_from_apk(user_input):
     print(user_input)
-    decompiled_folder = apk_decompiler_from_file(user_input)
+    decompiled_folder = cached_decompiler_from_file(user_input)
+    if decompiled_folder is None:
+        print("Error: decompilation of the APK failed")
+        return
     
-    manifest_path = os.path.join(decompiled_folder, "AndroidManifest.xml")
+    try:
+        manifest_path = os.path.join(decompiled_folder, "AndroidManifest.xml")
     
-    if not os.path.exists(manifest_path):
-        print(f"Error: AndroidManifest.xml not found in {decompiled_folder}")
-        return
-
-    custom_urls_server_from_manifest(manifest_path)
\ No newline at end of file
+        if not os.path.exists(manifest_path):
+            print(f"Error: AndroidManifest.xml not found in {decompiled_folder}")
+            return
+
+        custom_urls_server_from_manifest(manifest_path)
+    finally:
+        # The cached tree is read until the server stops
+        release_decompiled_apk(decompiled_folder)
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+# numpy (slow to import) is imported by the methods, only the files with matches need it
+
+# Bytes of the content converted to an array at a time while building the index
+INDEX_BLOCK_SIZE = 16 * 1024 * 1024
+
+class LineIndex():
+    def __init__(self, buffer, start=0):
+        """
+        Newline index of the content of a file, to resolve the byte offsets of the matches to lines and columns.
+        The index is built on the first resolution (files without matches never pay for it)
+        and only from the start offset (the byte range of the file scanned by a worker):
+        the lines are counted from the one containing the start offset, whose columns are counted
+        from the start offset (see merge_secrets_ranges for the lines and columns in the whole file).
+
+        Args:
+            buffer (mmap.mmap or bytes): The content.
+            start (int): Offsets before this one are never resolved.
+        """
+        import numpy as np
+        self.buffer = buffer
+        self.start = start
+        # A newline just before the start is assumed (the previous newline is found by the caller)
+        self._newlines = np.array([start - 1], dtype=np.int64)
+        self._end = start
+
+    def _blocks(self, start, end):
+        """
+        Newline mask of a region of the content, INDEX_BLOCK_SIZE bytes at a time.
+
+        Args:
+            start (int): Start of the region.
+            end (int): End of the region.
+
+        Yields:
+            tuple: (block offset, boolean array of the newlines of the block)
+        """
+        import numpy as np
+        for block_start in range(start, end, INDEX_BLOCK_SIZE):
+            count = min(INDEX_BLOCK_SIZE, end - block_start)
+            block = np.frombuffer(self.buffer, dtype=np.uint8, count=count, offset=block_start)
+            mask = block == ord("\n")
+            # The mapping can't be closed while an array uses it
+            del block
+            yield block_start, mask
+
+    def _extend(self, end):
+        """
+        Index the newlines up to an offset.
+
+        Args:
+            end (int): End of the indexed content.
+        """
+        import numpy as np
+        blocks = [self._newlines]
+        for block_start, mask in self._blocks(self._end, end):
+            blocks.append(np.flatnonzero(mask) + block_start)
+
+        self._newlines = np.concatenate(blocks)
+        self._end = max(self._end, end)
+
+    def count(self, end):
+        """
+        Newlines from the start offset up to an offset (read once, not indexed).
+
+        Args:
+            end (int): End of the counted content.
+
+        Returns:
+            tuple: (number of newlines, offset of the last one or start - 1 if none)
+        """
+        import numpy as np
+        newlines = sum(int(np.count_nonzero(mask)) for _, mask in self._blocks(self.start, end))
+        last_newline = self.buffer.rfind(b"\n", self.start, end) if newlines else self.start - 1
+
+        return newlines, last_newline
+
+    def resolve(self, offsets):
+        """
+        Lines and columns of byte offsets (binary search in the index).
+
+        Args:
+            offsets (list): Byte offsets (not before the start offset).
+
+        Returns:
+            list: (line, column) couples, both starting from 1 at the start offset (the column is counted in bytes).
+        """
+        import numpy as np
+        if not offsets:
+            return []
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+        end = min(int(offsets.max()) + 1, len(self.buffer))
+        if end > self._end:
+            self._extend(end)
+
+        # Indexed newlines before each offset (the first item always is)
+        positions = np.searchsorted(self._newlines, offsets)
+
+        lines = positions
+        columns = offsets - self._newlines[positions - 1]
+
+        return list(zip(lines.tolist(), columns.tolist()))
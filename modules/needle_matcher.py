@@ -0,0 +1,137 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import regex
+from modules.encoding_variants import UTF8, UTF16BE, UTF16LE, text_variants, utf16_duplicate, utf16_shifted
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+def parse_needle(needle):
+    """
+    Convert a needle (string or 0x<hex> byte sequence) to the lowercase bytes to be searched.
+
+    Args:
+        needle (str): The needle as written by the user.
+
+    Returns:
+        bytes: Lowercase bytes of the needle.
+
+    Raises:
+        ValueError: If a 0x<hex> needle is not a valid hex string.
+    """
+    if needle.startswith('0x'):
+        return bytes.fromhex(needle[2:]).lower()
+
+    return needle.encode('utf-8').lower()
+
+def load_needles(needles_file):
+    """
+    Load the needles of a multi-needle search (one string or 0x<hex> byte sequence for each line,
+    empty lines and lines starting with # are ignored).
+
+    Args:
+        needles_file (str): Path of the needles file.
+
+    Returns:
+        list: (needle as written in the file, lowercase bytes) couples without duplicates.
+
+    Raises:
+        IOError: If the file can't be read.
+        ValueError: If a 0x<hex> needle is not a valid hex string.
+    """
+    needles = {}
+
+    with open(needles_file, "r", encoding="utf-8") as f:
+        for line in f:
+            needle = line.rstrip("\r\n")
+            if not needle.strip() or needle.startswith("#"):
+                continue
+
+            needle_bytes = parse_needle(needle)
+            if needle_bytes:
+                needles.setdefault(needle_bytes, needle)
+
+    return [(needle, needle_bytes) for needle_bytes, needle in needles.items()]
+
+class NeedleMatcher():
+    def __init__(self, needles):
+        """
+        Case-insensitive matcher of many needles in a single pass over the content.
+        The string needles are matched in UTF-8 and in their UTF-16LE/BE and MUTF-8 variants.
+        An Aho-Corasick automaton (pyahocorasick) is used if available, otherwise an alternation
+        of all the needles (the needles that are a prefix of another one starting at the same offset are missed).
+
+        Args:
+            needles (list): (needle, lowercase bytes) couples returned by load_needles.
+        """
+        self.needles = needles
+
+        # (needle index, encoding, lowercase bytes) of each searched byte sequence
+        variants = []
+        for index, (needle, needle_bytes) in enumerate(needles):
+            variants.append((index, UTF8, needle_bytes))
+            if not needle.startswith('0x'):
+                variants.extend((index, encoding, variant.lower()) for encoding, variant in text_variants(needle_bytes.decode('utf-8')))
+        # Variants equal to another needle (e.g. a 0x<hex> needle) are searched once
+        unique = {}
+        for index, encoding, variant in variants:
+            unique.setdefault(variant, (index, encoding))
+
+        # The UTF-16LE text matches also the UTF-16BE variant one byte earlier (and vice versa)
+        self._shifted = {(index, encoding) for variant, (index, encoding) in unique.items()
+                         if encoding in (UTF16LE, UTF16BE) and utf16_shifted(variant)}
+
+        # Longest needle, the overlap between two windows of the content
+        self.max_length = max((len(variant) for variant in unique), default=0)
+
+        if ahocorasick:
+            self._automaton = ahocorasick.Automaton()
+            for variant, (index, encoding) in unique.items():
+                # latin-1 maps each byte to a single character
+                self._automaton.add_word(variant.decode('latin-1'), (index, encoding, len(variant)))
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            # Longest needles first, so that the longest needle starting at an offset is preferred
+            self._groups = sorted(((index, encoding, variant) for variant, (index, encoding) in unique.items()), key=lambda v: -len(v[2]))
+            self._regex = regex.compile(b"|".join(b"(" + regex.escape(variant) + b")" for _, _, variant in self._groups),
+                                        flags=regex.IGNORECASE)
+
+    def finditer(self, buffer, start, end):
+        """
+        Find the occurrences of all the needles in a region of the content (overlapping occurrences included).
+
+        Args:
+            buffer (mmap.mmap or bytes): The content.
+            start (int): Start of the region.
+            end (int): End of the region.
+
+        Yields:
+            tuple: (needle index, start, end, encoding) of each occurrence with absolute offsets.
+        """
+        if not self.needles:
+            return
+
+        for index, match_start, match_end, encoding in self._occurrences(buffer, start, end):
+            # A UTF-16 text is reported once, with the endianness of its string
+            if (index, encoding) in self._shifted and utf16_duplicate(buffer, match_start, match_end, encoding):
+                continue
+            yield index, match_start, match_end, encoding
+
+    def _occurrences(self, buffer, start, end):
+        # Occurrences of all the variants (a UTF-16 text can match both endianness)
+        if self._automaton is not None:
+            # Case folding of the ASCII letters only (as the case-insensitive search of bytes)
+            text = buffer[start:end].lower().decode('latin-1')
+            for last, (index, encoding, length) in self._automaton.iter(text):
+                yield index, start + last + 1 - length, start + last + 1, encoding
+        else:
+            for match in self._regex.finditer(buffer, start, end, overlapped=True):
+                index, encoding, _ = self._groups[match.lastindex - 1]
+                yield index, match.start(), match.end(), encoding
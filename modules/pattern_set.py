@@ -0,0 +1,448 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import regex
+from collections import defaultdict
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse, sre_constants
+
+# Literal anchors used by the pattern set prefilter
+# (an anchor is a tuple of byte classes, one per position, lowercase)
+MIN_ANCHOR_LENGTH = 3
+MAX_ANCHOR_ALTERNATIVES = 16
+MAX_ANCHOR_CLASS_SIZE = 4
+
+# Patterns without anchors are searched only around the runs of characters they require
+# (e.g. [0-9a-zA-Z]{32} only in runs of at least 32 alphanumeric characters)
+MIN_REQUIRED_RUN = 8
+# Candidate regions closer than this are searched as a single region
+REGION_GAP = 256
+
+# Upper bound of the overlap between consecutive windows of a content
+MAX_OVERLAP = 64 * 1024
+
+# Bump it when the analysis of the patterns changes (the cached analyses are discarded)
+ANALYSIS_VERSION = 1
+
+def _choose_anchor(candidates):
+    """
+    Choose the most selective set of anchor alternatives among the candidates.
+
+    Args:
+        candidates (list): Sets of anchors, one of which must occur in every match.
+
+    Returns:
+        set: The chosen set of anchors or None if no candidate is selective enough.
+    """
+    valid = [c for c in candidates if c and min(len(x) for x in c) >= MIN_ANCHOR_LENGTH]
+    if not valid:
+        return None
+    # Prefer few alternatives, then longer anchors
+    return min(valid, key=lambda c: (len(c), -min(len(x) for x in c)))
+
+def _anchor_sequence(items):
+    """
+    Analyse a parsed regex sequence looking for the anchors required by every match.
+
+    Args:
+        items (list): Parsed items (sre_parse format) of the sequence.
+
+    Returns:
+        tuple: (exact, required) where exact is the set of anchors matching the whole sequence
+               (None if the sequence is not a pure literal sequence) and required is the best anchor set.
+    """
+    run = {()}
+    broken = False
+    candidates = []
+
+    for item in items:
+        exact, required = _anchor_item(item)
+
+        if exact is not None:
+            joined = {a + b for a in run for b in exact}
+            if len(joined) <= MAX_ANCHOR_ALTERNATIVES:
+                run = joined
+                continue
+            # Too many combinations: close the current run and start a new one
+            candidates.append(run)
+            run = exact
+        else:
+            candidates.append(run)
+            candidates.append(required)
+            run = {()}
+        broken = True
+
+    candidates.append(run)
+    return (None if broken else run), _choose_anchor(candidates)
+
+def _anchor_item(item):
+    """
+    Analyse a single parsed regex item (see _anchor_sequence).
+    """
+    op, av = item
+
+    if op == sre_constants.LITERAL:
+        return {(frozenset(bytes([av]).lower()),)}, None
+
+    if op == sre_constants.IN:
+        if len(av) <= MAX_ANCHOR_CLASS_SIZE and all(o == sre_constants.LITERAL for o, _ in av):
+            return {(frozenset(bytes([c for _, c in av]).lower()),)}, None
+        return None, None
+
+    if op == sre_constants.AT or op == sre_constants.ASSERT_NOT:
+        # Zero-width items don't break an anchor
+        return {()}, None
+
+    if op == sre_constants.ASSERT:
+        # A lookaround is zero-width, but its content must be in the text
+        exact, required = _anchor_sequence(av[1])
+        return None, (_choose_anchor([exact]) if exact is not None else required)
+
+    if op == sre_constants.SUBPATTERN:
+        return _anchor_sequence(av[-1])
+
+    if op == sre_constants.BRANCH:
+        branches = [_anchor_sequence(b) for b in av[1]]
+        if all(exact is not None for exact, _ in branches):
+            union = set().union(*[exact for exact, _ in branches])
+            if len(union) <= MAX_ANCHOR_ALTERNATIVES:
+                return union, _choose_anchor([union])
+        required = [_choose_anchor([exact]) if exact is not None else best for exact, best in branches]
+        if all(required):
+            union = set().union(*required)
+            if len(union) <= MAX_ANCHOR_ALTERNATIVES:
+                return None, union
+        return None, None
+
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        min_repeat, max_repeat, body = av
+        if min_repeat == 0:
+            return None, None
+        exact, required = _anchor_sequence(body)
+        if min_repeat == max_repeat == 1:
+            return exact, required
+        return None, (_choose_anchor([exact]) if exact is not None else None) or required
+
+    return None, None
+
+def _item_charset(item):
+    """
+    Set of bytes that a parsed regex item can consume (None if unbounded or context dependent).
+    """
+    op, av = item
+
+    if op == sre_constants.LITERAL:
+        return {av}
+
+    if op == sre_constants.IN:
+        charset = set()
+        for o, a in av:
+            if o == sre_constants.LITERAL:
+                charset.add(a)
+            elif o == sre_constants.RANGE:
+                charset.update(range(a[0], a[1] + 1))
+            elif o == sre_constants.CATEGORY and a == sre_constants.CATEGORY_DIGIT:
+                charset.update(b"0123456789")
+            elif o == sre_constants.CATEGORY and a == sre_constants.CATEGORY_WORD:
+                charset.update(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_")
+            else:
+                return None
+        return charset
+
+    if op == sre_constants.SUBPATTERN:
+        return _sequence_charset(av[-1])
+
+    if op == sre_constants.BRANCH:
+        charset = set()
+        for branch in av[1]:
+            branch_charset = _sequence_charset(branch)
+            if branch_charset is None:
+                return None
+            charset.update(branch_charset)
+        return charset
+
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        return _sequence_charset(av[2])
+
+    # Anchors, lookarounds, any char, negated literals, ...
+    return None
+
+def _sequence_charset(items):
+    charset = set()
+    for item in items:
+        item_charset = _item_charset(item)
+        if item_charset is None:
+            return None
+        charset.update(item_charset)
+    return charset
+
+def _required_run(items):
+    # Longest run of a charset that every match of the sequence must contain
+    best = None
+    for op, av in items:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            charset = _sequence_charset(av[2])
+            min_run = av[0] * sre_parse.SubPattern(None, av[2]).getwidth()[0]
+            if charset is not None and (best is None or min_run > best[1]):
+                best = (charset, min_run)
+        elif op == sre_constants.SUBPATTERN:
+            run = _required_run(av[-1])
+            if run and (best is None or run[1] > best[1]):
+                best = run
+    return best
+
+def _context_free(items):
+    # True if the sequence has no anchors or lookarounds
+    for op, av in items:
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT,
+                  sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return False
+        if op == sre_constants.SUBPATTERN and not _context_free(av[-1]):
+            return False
+        if op == sre_constants.BRANCH and not all(_context_free(b) for b in av[1]):
+            return False
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and not _context_free(av[2]):
+            return False
+    return True
+
+def region_spec(compiled_regex):
+    """
+    Describe where the matches of a regex without anchors can be.
+
+    Args:
+        compiled_regex (regex.Pattern): Compiled regex.
+
+    Returns:
+        tuple: ('run', charset, min_run, expand) if every match contains a run of at least min_run
+               bytes of charset and lies within expand bytes from it,
+               ('tail', max_width) if every match ends at the end of the content
+               or None if the regex must be searched everywhere.
+    """
+    try:
+        parsed = sre_parse.parse(compiled_regex.pattern, 0)
+    except Exception:
+        return None
+
+    items = list(parsed)
+    min_width, max_width = parsed.getwidth()
+    bounded = max_width < sre_constants.MAXREPEAT
+
+    if items and items[-1] == (sre_constants.AT, sre_constants.AT_END) and bounded and _context_free(items[:-1]):
+        return ("tail", max_width)
+
+    if not _context_free(items):
+        return None
+
+    ignorecase = compiled_regex.flags & regex.IGNORECASE
+    charset = _sequence_charset(items)
+    if charset is not None and min_width >= MIN_REQUIRED_RUN:
+        # Every match is itself a run of the charset
+        if ignorecase:
+            charset.update(bytes(charset).swapcase())
+        return ("run", frozenset(charset), min_width, 0)
+
+    run = _required_run(items)
+    if run and run[1] >= MIN_REQUIRED_RUN and bounded:
+        charset = set(run[0])
+        if ignorecase:
+            charset.update(bytes(charset).swapcase())
+        return ("run", frozenset(charset), run[1], max_width)
+
+    return None
+
+def max_match_width(compiled_regex):
+    """
+    Maximum length of a match of the regex.
+
+    Args:
+        compiled_regex (regex.Pattern): Compiled regex.
+
+    Returns:
+        int: The maximum match length or None if unbounded (or unknown).
+    """
+    try:
+        max_width = sre_parse.parse(compiled_regex.pattern, 0).getwidth()[1]
+    except Exception:
+        return None
+
+    return max_width if max_width < sre_constants.MAXREPEAT else None
+
+def literal_anchors(compiled_regex):
+    """
+    Extract the anchors such that every match of the regex contains at least one of them.
+
+    Args:
+        compiled_regex (regex.Pattern): Compiled regex.
+
+    Returns:
+        set: Anchors (tuples of lowercase byte classes) or None if the regex has no selective anchor.
+    """
+    try:
+        parsed = sre_parse.parse(compiled_regex.pattern, 0)
+    except Exception:
+        # Syntax supported only by the regex module
+        return None
+
+    exact, required = _anchor_sequence(list(parsed))
+    if exact is not None:
+        return _choose_anchor([exact])
+    return required
+
+def _anchor_regex(anchor):
+    # Regex source of an anchor (on lowercase content)
+    source = b""
+    for byte_class in anchor:
+        escaped = b"".join(regex.escape(bytes([c])) for c in sorted(byte_class))
+        source += escaped if len(byte_class) == 1 else b"[" + escaped + b"]"
+    return regex.compile(source)
+
+def analyse_patterns(patterns):
+    """
+    Analyse a list of regexes for a pattern set (anchors, regions and overlap).
+
+    Args:
+        patterns (list): Compiled regexes (bytes patterns).
+
+    Returns:
+        dict: JSON serializable analysis (it depends only on the patterns, so it can be cached).
+    """
+    anchors = defaultdict(list)
+    unanchored = []
+    regions = []
+
+    for index, compiled_regex in enumerate(patterns):
+        pattern_anchors = literal_anchors(compiled_regex)
+        if pattern_anchors:
+            for anchor in pattern_anchors:
+                anchors[anchor].append(index)
+        else:
+            unanchored.append(index)
+            spec = region_spec(compiled_regex)
+            if spec and spec[0] == "run":
+                regions.append([index, "run", sorted(spec[1]), spec[2], spec[3]])
+            elif spec:
+                regions.append([index, *spec])
+
+    # Overlap needed between windows to find every match of the bounded patterns
+    widths = [w for w in map(max_match_width, patterns) if w]
+
+    return {
+        "version": ANALYSIS_VERSION,
+        "overlap": min(max(widths, default=0), MAX_OVERLAP),
+        "unanchored": unanchored,
+        "regions": regions,
+        "anchors": [[[sorted(byte_class) for byte_class in anchor], indexes] for anchor, indexes in anchors.items()],
+    }
+
+class PatternSet():
+    def __init__(self, patterns, analysis=None):
+        """
+        Compile a list of regexes into a pattern set.
+
+        Every chunk is lowercased once and checked for the literal anchors of the patterns,
+        then only the regexes whose anchors were found are evaluated. The regexes without
+        anchors are evaluated only in the regions where a match can be (see region_spec).
+
+        Args:
+            patterns (list): Compiled regexes (bytes patterns).
+            analysis (dict): Analysis of the patterns returned by analyse_patterns (computed if None or outdated).
+        """
+        if not analysis or analysis.get("version") != ANALYSIS_VERSION:
+            analysis = analyse_patterns(patterns)
+
+        self.patterns = patterns
+        self.analysis = analysis
+        self.overlap = analysis["overlap"]
+        self._unanchored = list(analysis["unanchored"])
+        self._regions = {}
+        for index, kind, *spec in analysis["regions"]:
+            if kind == "run":
+                self._regions[index] = (kind, frozenset(spec[0]), spec[1], spec[2])
+            else:
+                self._regions[index] = (kind, *spec)
+        anchors = {tuple(frozenset(byte_class) for byte_class in anchor): indexes for anchor, indexes in analysis["anchors"]}
+
+        # Plain anchors are checked as literals, the ones with classes (e.g. [t|T][w|W][i|I]...)
+        # as their main literal if the chunk doesn't contain the other characters of the classes,
+        # with a small regex otherwise
+        self._literal_anchors = []
+        self._class_anchors = []
+        for anchor, indexes in anchors.items():
+            if all(len(c) == 1 for c in anchor):
+                self._literal_anchors.append((bytes(min(c) for c in anchor), indexes))
+            else:
+                main = bytes(min(c, key=lambda x: (not bytes([x]).isalnum(), x)) for c in anchor)
+                others = [bytes([x]) for x in set().union(*anchor) - set(main)]
+                self._class_anchors.append((main, others, _anchor_regex(anchor), indexes))
+
+        # Translation tables used to find the runs of each charset
+        self._run_tables = {}
+        for spec in self._regions.values():
+            if spec[0] == "run" and spec[1] not in self._run_tables:
+                self._run_tables[spec[1]] = bytes(0x61 if i in spec[1] else 0x20 for i in range(256))
+
+    def candidates(self, chunk):
+        """
+        Indexes (sorted) of the patterns to be evaluated on the chunk.
+        """
+        selected = set(self._unanchored)
+        lowered = chunk.lower()
+
+        for literal, indexes in self._literal_anchors:
+            if not selected.issuperset(indexes) and literal in lowered:
+                selected.update(indexes)
+
+        for main, others, anchor_regex, indexes in self._class_anchors:
+            if selected.issuperset(indexes):
+                continue
+            if any(o in lowered for o in others):
+                found = anchor_regex.search(lowered)
+            else:
+                found = main in lowered
+            if found:
+                selected.update(indexes)
+
+        return sorted(selected)
+
+    def regions(self, chunk, index, translated):
+        """
+        Regions (start, end) of the chunk where the pattern can match.
+
+        Args:
+            chunk (bytes): Content to be searched.
+            index (int): Index of the pattern.
+            translated (dict): Chunk translated with the run tables (filled on demand).
+        """
+        spec = self._regions.get(index)
+        if spec is None:
+            return [(0, len(chunk))]
+
+        if spec[0] == "tail":
+            return [(max(0, len(chunk) - spec[1] - 1), len(chunk))]
+
+        _, charset, min_run, expand = spec
+        if charset not in translated:
+            # Runs of the charset become runs of 'a'
+            translated[charset] = chunk.translate(self._run_tables[charset])
+        runs = translated[charset]
+
+        regions = []
+        needle = b"a" * min_run
+        start = runs.find(needle)
+        while start != -1:
+            end = runs.find(b" ", start + min_run)
+            if end == -1:
+                end = len(runs)
+            region_start, region_end = max(0, start - expand), min(len(runs), end + expand)
+            if regions and region_start - regions[-1][1] <= REGION_GAP:
+                regions[-1] = (regions[-1][0], region_end)
+            else:
+                regions.append((region_start, region_end))
+            start = runs.find(needle, end)
+
+        return regions
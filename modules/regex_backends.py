@@ -0,0 +1,161 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import os
+import regex
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Backend of the rules without a "backend" in their rule pack
+REGEX_BACKEND_ENV = "HACKNDROID_REGEX_BACKEND"
+DEFAULT_BACKEND = "regex"
+
+class BackendError(Exception):
+    """
+    A backend can't compile a pattern (unsupported syntax) or is not available.
+    """
+
+class RegexBackend():
+    # Backtracking engine of the regex module (full syntax, evaluations limited by a timeout)
+    name = "regex"
+    linear_time = False
+    available = True
+
+    def compile(self, pattern, flags=0):
+        """
+        Compile a bytes pattern.
+
+        Args:
+            pattern (bytes): Source of the pattern.
+            flags (int): Flags of the regex module (IGNORECASE, MULTILINE, DOTALL, VERBOSE).
+
+        Returns:
+            object: Compiled pattern with the pattern and flags attributes and
+                    finditer(buffer, pos, endpos, timeout=None) yielding match objects.
+
+        Raises:
+            BackendError: If the pattern can't be compiled.
+        """
+        try:
+            return regex.compile(pattern, flags=flags)
+        except regex.error as e:
+            raise BackendError(str(e))
+
+class Re2Match():
+    __slots__ = ("_start", "_end", "_group")
+
+    def __init__(self, start, end, group):
+        """
+        Match found by RE2 in a part of the content, with the offsets of the whole content.
+        """
+        self._start = start
+        self._end = end
+        self._group = group
+
+    def start(self):
+        return self._start
+
+    def end(self):
+        return self._end
+
+    def span(self):
+        return self._start, self._end
+
+    def group(self):
+        return self._group
+
+class Re2Pattern():
+    def __init__(self, pattern, flags, compiled):
+        """
+        Pattern compiled by RE2, with the interface of the regex module patterns used by the secrets engine.
+
+        Args:
+            pattern (bytes): Source of the pattern.
+            flags (int): Flags of the regex module (used by the pattern set analysis).
+            compiled (re2._Regexp): The compiled pattern.
+        """
+        self.pattern = pattern
+        self.flags = flags
+        self._compiled = compiled
+        # Without MULTILINE, $ of the regex module also matches before a final newline, $ of RE2 doesn't
+        self._final_newline = b"$" in pattern and not flags & regex.MULTILINE
+
+    def finditer(self, buffer, pos=0, endpos=None, timeout=None):
+        # RE2 runs in linear time, so no timeout is needed
+        endpos = len(buffer) if endpos is None else endpos
+        if not self._final_newline or endpos <= pos or buffer[endpos - 1] != ord("\n"):
+            return self._compiled.finditer(buffer, pos, endpos)
+
+        # The matches ending before the final newline are added, as long as they don't overlap the other ones
+        # (RE2 matches $ only at the real end of the text, so the text without the newline is searched)
+        matches = list(self._compiled.finditer(buffer, pos, endpos))
+        with memoryview(buffer) as view, view[pos:endpos - 1] as text:
+            matches.extend(Re2Match(pos + match.start(), pos + match.end(), bytes(match.group()))
+                           for match in self._compiled.finditer(text) if match.end() == len(text))
+        results = []
+        for match in sorted(matches, key=lambda m: (m.start(), -m.end())):
+            if not results or (match.start() >= results[-1].end() and match.span() != results[-1].span()):
+                results.append(match)
+        return iter(results)
+
+class Re2Backend(RegexBackend):
+    # Linear-time engine of google-re2 (no backreferences and lookarounds)
+    name = "re2"
+    linear_time = True
+    available = re2 is not None
+
+    _INLINE_FLAGS = ((regex.IGNORECASE, b"i"), (regex.MULTILINE, b"m"), (regex.DOTALL, b"s"))
+
+    def compile(self, pattern, flags=0):
+        if re2 is None:
+            raise BackendError("google-re2 is not installed (pip install google-re2)")
+        if flags & regex.VERBOSE:
+            raise BackendError("VERBOSE patterns are not supported by RE2")
+
+        options = re2.Options()
+        # Every byte is a character, as in the bytes patterns of the regex module
+        options.encoding = re2.Options.Encoding.LATIN1
+        options.log_errors = False
+
+        inline = b"".join(letter for flag, letter in self._INLINE_FLAGS if flags & flag)
+        try:
+            compiled = re2.compile((b"(?" + inline + b")" if inline else b"") + pattern, options)
+        except re2.error as e:
+            raise BackendError(e.args[0].decode("utf-8", "replace") if e.args and isinstance(e.args[0], bytes) else str(e))
+
+        return Re2Pattern(pattern, flags, compiled)
+
+BACKENDS = {backend.name: backend for backend in (RegexBackend(), Re2Backend())}
+
+def default_backend():
+    """
+    Backend of the rules that don't choose one (HACKNDROID_REGEX_BACKEND environment variable, regex if missing).
+
+    Returns:
+        str: Name of the backend.
+    """
+    return os.environ.get(REGEX_BACKEND_ENV, DEFAULT_BACKEND)
+
+def get_backend(name):
+    """
+    Get a backend by name.
+
+    Args:
+        name (str): Name of the backend (see BACKENDS).
+
+    Returns:
+        RegexBackend: The backend.
+
+    Raises:
+        BackendError: If the backend doesn't exist.
+    """
+    if name not in BACKENDS:
+        raise BackendError(f"unknown regex backend '{name}' (available: {', '.join(BACKENDS)})")
+
+    return BACKENDS[name]
@@ -0,0 +1,190 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import csv
+import json
+import os
+from array import array
+from heapq import nlargest
+
+# Files kept as examples of each matched string in the summary
+SAMPLE_FILES = 3
+
+class ResultSink():
+    def __init__(self, output_file, fieldnames):
+        """
+        Incremental writer of the results of a search (CSV and JSONL with the same name).
+        The results of each file are written (and flushed) as soon as they are available,
+        so nothing is accumulated in memory.
+
+        Args:
+            output_file (str): Path of the CSV file (the JSONL file has the same name and .jsonl extension).
+            fieldnames (list): Columns of the CSV file (keys of the JSONL records).
+        """
+        self.output_file = output_file
+        self.jsonl_file = os.path.splitext(output_file)[0] + ".jsonl"
+        self.rows = 0
+
+        self._csv_f = open(output_file, "w", newline="", encoding="utf-8")
+        self._jsonl_f = open(self.jsonl_file, "w", encoding="utf-8")
+        self._writer = csv.DictWriter(self._csv_f, fieldnames=fieldnames)
+        self._writer.writeheader()
+
+    def write(self, rows):
+        """
+        Write the results of a file.
+
+        Args:
+            rows (list): Results of the file (dicts with the CSV columns as keys).
+        """
+        for row in rows:
+            self._writer.writerow(row)
+            self._jsonl_f.write(json.dumps(row) + "\n")
+
+        self.rows += len(rows)
+        self._csv_f.flush()
+        self._jsonl_f.flush()
+
+    def close(self):
+        """
+        Close the output files (removed if no result was written).
+
+        Returns:
+            bool: True if at least one result was written.
+        """
+        self._csv_f.close()
+        self._jsonl_f.close()
+
+        if not self.rows:
+            os.remove(self.output_file)
+            os.remove(self.jsonl_file)
+
+        return self.rows > 0
+
+class MatchGroup():
+    __slots__ = ("pattern", "match", "count", "files", "samples")
+
+    def __init__(self, pattern, match):
+        """
+        Occurrences of the same string matched by a pattern in all the files.
+
+        Args:
+            pattern (int): Id of the pattern (index of RegexSummary.patterns).
+            match (str): The matched string.
+        """
+        self.pattern = pattern
+        self.match = match
+        self.count = 0
+        self.files = 0
+        # (file id, line, column) of the first files with the match (file ids are indexes of RegexSummary.files)
+        self.samples = []
+
+class RegexSummary():
+    def __init__(self):
+        """
+        Summary of the secrets found, for the console tables (the full detail is in the results file).
+        The matches are aggregated by (pattern, matched string), with the pattern names and the
+        file paths stored once and referenced by id, so a token matched in thousands of files
+        costs a single record.
+        """
+        # Pattern names and paths of the files with matches, by id
+        self.patterns = []
+        self.files = []
+        # Matches of each file (by file id)
+        self.file_matches = array("L")
+        # Pattern id -> [matches, files]
+        self.pattern_counts = {}
+        # (pattern id, matched string) -> MatchGroup
+        self.groups = {}
+        self._pattern_ids = {}
+
+    def add(self, file_matches):
+        """
+        Add the matches of a file (all the matches of a file are added together).
+
+        Args:
+            file_matches (list): Matches of the file.
+        """
+        if not file_matches:
+            return
+
+        file_id = len(self.files)
+        self.files.append(file_matches[0]["file"])
+        self.file_matches.append(len(file_matches))
+        file_groups = set()
+
+        for match in file_matches:
+            pattern_id = self._pattern_ids.get(match["pattern_name"])
+            if pattern_id is None:
+                pattern_id = self._pattern_ids[match["pattern_name"]] = len(self.patterns)
+                self.patterns.append(match["pattern_name"])
+
+            key = (pattern_id, match["match"])
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = MatchGroup(pattern_id, match["match"])
+            group.count += 1
+
+            counts = self.pattern_counts.setdefault(pattern_id, [0, 0])
+            counts[0] += 1
+
+            if key not in file_groups:
+                file_groups.add(key)
+                group.files += 1
+                if len(group.samples) < SAMPLE_FILES:
+                    group.samples.append((file_id, match["line"], match["column"]))
+
+        for pattern_id in set(pattern_id for pattern_id, _ in file_groups):
+            self.pattern_counts[pattern_id][1] += 1
+
+    def total_matches(self):
+        """
+        Returns:
+            int: Number of matches in all the files.
+        """
+        return sum(self.file_matches)
+
+    def top_files(self, limit):
+        """
+        Files with the most matches.
+
+        Args:
+            limit (int): Max number of files.
+
+        Returns:
+            list: (file path, matches) couples, the most matches first.
+        """
+        file_ids = nlargest(limit, range(len(self.files)), key=self.file_matches.__getitem__)
+        return [(self.files[file_id], self.file_matches[file_id]) for file_id in file_ids]
+
+    def top_patterns(self, limit):
+        """
+        Patterns with the most matches.
+
+        Args:
+            limit (int): Max number of patterns.
+
+        Returns:
+            list: (pattern name, matches, files) tuples, the most matches first.
+        """
+        pattern_ids = nlargest(limit, self.pattern_counts, key=lambda pattern_id: self.pattern_counts[pattern_id][0])
+        return [(self.patterns[pattern_id], *self.pattern_counts[pattern_id]) for pattern_id in pattern_ids]
+
+    def top_matches(self, limit):
+        """
+        Strings matched the most times.
+
+        Args:
+            limit (int): Max number of strings.
+
+        Returns:
+            list: (pattern name, matched string, matches, files, sample locations as file:line:column) tuples,
+                  the most matches first.
+        """
+        groups = nlargest(limit, self.groups.values(), key=lambda group: (group.count, group.files))
+        return [(self.patterns[group.pattern], group.match, group.count, group.files,
+                 [f"{self.files[file_id]}:{line}:{column}" for file_id, line, column in group.samples])
+                for group in groups]
@@ -0,0 +1,217 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import hashlib
+import json
+import os
+import regex
+import multiprocessing
+from termcolor import colored
+from modules.regex_backends import BackendError, default_backend, get_backend
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Rule packs shipped with HacknDroid
+VENDOR_RULE_PACKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "rule_packs")
+# Folders of the rule packs shared by a team (separated by os.pathsep)
+TEAM_RULE_PACKS_ENV = "HACKNDROID_RULE_PACKS"
+# Rule packs of the user
+USER_RULE_PACKS = os.path.join(os.path.expanduser("~"), ".hackndroid", "rule_packs")
+
+# Pattern set analysis of each rule set (see PatternSet), so that it isn't repeated on every launch
+RULES_CACHE_FOLDER = os.path.join("results", "advanced_search", "rules_cache")
+
+RULE_PACK_EXTENSIONS = (".json", ".yaml", ".yml")
+REGEX_FLAGS = {
+    "IGNORECASE": regex.IGNORECASE,
+    "MULTILINE": regex.MULTILINE,
+    "DOTALL": regex.DOTALL,
+    "VERBOSE": regex.VERBOSE,
+}
+
+# Backends not installed, already reported
+_MISSING_BACKENDS = set()
+
+def warn(message):
+    # Only the main process reports the problems of the rules (the workers load the same rules)
+    if multiprocessing.parent_process() is None:
+        print(colored(message, "red"))
+
+def rule_pack_files():
+    """
+    Rule packs to be loaded: the vendor ones, then the team ones and the user ones
+    (sorted by name in each folder, the later packs override the rules with the same name).
+
+    Returns:
+        list: Paths of the rule packs.
+    """
+    folders = [VENDOR_RULE_PACKS]
+    folders.extend(folder for folder in os.environ.get(TEAM_RULE_PACKS_ENV, "").split(os.pathsep) if folder)
+    folders.append(USER_RULE_PACKS)
+
+    pack_files = []
+    for folder in folders:
+        if os.path.isdir(folder):
+            pack_files.extend(os.path.join(folder, filename) for filename in sorted(os.listdir(folder))
+                              if filename.lower().endswith(RULE_PACK_EXTENSIONS))
+
+    return pack_files
+
+def _normalize_entry(name, entry):
+    # Single entry of a rule with the default values
+    if not isinstance(entry, dict) or not isinstance(entry.get("regex"), str):
+        raise ValueError(f"rule '{name}' must have a 'regex' string")
+
+    flags = entry.get("flags", [])
+    unknown = [flag for flag in flags if flag not in REGEX_FLAGS]
+    if unknown:
+        raise ValueError(f"rule '{name}' has unknown flags {unknown} (available: {', '.join(REGEX_FLAGS)})")
+
+    try:
+        backend = get_backend(entry.get("backend", default_backend()))
+    except BackendError as e:
+        raise ValueError(f"rule '{name}': {e}")
+    if not backend.available:
+        if backend.name not in _MISSING_BACKENDS:
+            _MISSING_BACKENDS.add(backend.name)
+            warn(f"The {backend.name} regex backend is not installed, the regex module is used")
+        # The digest of the rules must reflect the backend actually used
+        backend = get_backend("regex")
+
+    return {"regex": entry["regex"], "flags": sorted(flags), "light_search": bool(entry.get("light_search", False)),
+            "backend": backend.name, "enabled": bool(entry.get("enabled", True))}
+
+def read_rule_pack(pack_file):
+    """
+    Read a rule pack (JSON or YAML):
+    {"name": ..., "rules": {rule name: {"regex": ..., "flags": ["IGNORECASE"], "light_search": true, "backend": "re2"}
+                            or a list of them}}.
+    A rule with "enabled": false disables the rule with the same name of the previous packs.
+    The rules without a backend use the default one (see default_backend), the regex module
+    is used if the backend is not installed.
+
+    Args:
+        pack_file (str): Path of the rule pack.
+
+    Returns:
+        dict: Rule name -> list of entries.
+
+    Raises:
+        IOError: If the file can't be read.
+        ValueError: If the content is not a valid rule pack (or a YAML pack can't be read without PyYAML).
+    """
+    with open(pack_file, "r", encoding="utf-8") as f:
+        if pack_file.lower().endswith(".json"):
+            content = json.load(f)
+        elif yaml:
+            try:
+                content = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(str(e))
+        else:
+            raise ValueError("YAML rule packs need PyYAML (pip install pyyaml)")
+
+    if not isinstance(content, dict) or not isinstance(content.get("rules"), dict):
+        raise ValueError("a rule pack must have a 'rules' mapping")
+
+    return {name: [_normalize_entry(name, entry) for entry in (entries if isinstance(entries, list) else [entries])]
+            for name, entries in content["rules"].items()}
+
+def load_rule_packs():
+    """
+    Load and merge all the rule packs (the invalid ones are reported and skipped).
+
+    Returns:
+        tuple: (rule name -> list of entries, hex digest of the merged rules)
+    """
+    rules = {}
+
+    for pack_file in rule_pack_files():
+        try:
+            pack_rules = read_rule_pack(pack_file)
+        except (IOError, ValueError) as e:
+            warn(f"Invalid rule pack {pack_file}: {e}")
+            continue
+
+        for name, entries in pack_rules.items():
+            rules.pop(name, None)
+            entries = [entry for entry in entries if entry["enabled"]]
+            if entries:
+                rules[name] = entries
+
+    h = hashlib.blake2b(json.dumps(rules, sort_keys=True).encode("utf-8"), digest_size=16)
+    return rules, h.hexdigest()
+
+def compile_rules(rules):
+    """
+    Compile the regexes of the rules with their backend (the ones the backend can't compile are reported and skipped).
+
+    Args:
+        rules (dict): Rules returned by load_rule_packs.
+
+    Returns:
+        dict: Rule name -> list of {"regex": compiled bytes regex, "light_search": bool}.
+    """
+    compiled = {}
+
+    for name, entries in rules.items():
+        for entry in entries:
+            flags = 0
+            for flag in entry["flags"]:
+                flags |= REGEX_FLAGS[flag]
+
+            try:
+                pattern = get_backend(entry["backend"]).compile(entry["regex"].encode("latin-1"), flags)
+            except UnicodeEncodeError as e:
+                warn(f"Invalid regex of the rule '{name}': {e}")
+                continue
+            except BackendError as e:
+                warn(f"Rule '{name}' skipped, the {entry['backend']} backend can't compile it: {e}")
+                continue
+
+            compiled.setdefault(name, []).append({"regex": pattern, "light_search": entry["light_search"]})
+
+    return compiled
+
+def _analysis_path(key):
+    return os.path.join(RULES_CACHE_FOLDER, f"{key}.json")
+
+def load_analysis(key):
+    """
+    Cached pattern set analysis of a rule set.
+
+    Args:
+        key (str): Key of the rule set (digest of the rules and search mode).
+
+    Returns:
+        dict: The analysis or None if not cached.
+    """
+    try:
+        with open(_analysis_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+def save_analysis(key, analysis):
+    """
+    Cache the pattern set analysis of a rule set (errors are ignored, the analysis is repeated next time).
+
+    Args:
+        key (str): Key of the rule set.
+        analysis (dict): JSON serializable analysis.
+    """
+    try:
+        os.makedirs(RULES_CACHE_FOLDER, exist_ok=True)
+        # Written to a temporary file and renamed, as the workers may save it at the same time
+        temp_path = f"{_analysis_path(key)}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(analysis, f)
+        os.replace(temp_path, _analysis_path(key))
+    except OSError:
+        pass
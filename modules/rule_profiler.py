@@ -0,0 +1,108 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import csv
+from termcolor import colored
+from tabulate import tabulate
+
+# Rules shown in the slowest rules table
+SLOWEST_RULES = 20
+
+def merge_file_profiles(profiles):
+    """
+    Merge the profiles of the byte ranges of a file.
+
+    Args:
+        profiles (list): Profiles of the ranges ({pattern name: [seconds, matches, timeouts]}).
+
+    Returns:
+        dict: Profile of the file.
+    """
+    merged = {}
+    for profile in profiles:
+        for name, (elapsed, matches, timeouts) in profile.items():
+            stats = merged.setdefault(name, [0.0, 0, 0])
+            stats[0] += elapsed
+            stats[1] += matches
+            stats[2] += timeouts
+
+    return merged
+
+class RuleProfile():
+    def __init__(self):
+        """
+        Cost of each rule of a secrets search (wall time, matches, timeouts and slowest file).
+        """
+        self.rules = {}
+
+    def add_file(self, filepath, file_profile):
+        """
+        Add the profile of a scanned file.
+
+        Args:
+            filepath (str): Path of the file.
+            file_profile (dict): {pattern name: [seconds, matches, timeouts]} of the file.
+        """
+        for name, (elapsed, matches, timeouts) in file_profile.items():
+            stats = self.rules.setdefault(name, {"time": 0.0, "matches": 0, "timeouts": 0, "files": 0,
+                                                 "worst_file": None, "worst_time": 0.0})
+            stats["time"] += elapsed
+            stats["matches"] += matches
+            stats["timeouts"] += timeouts
+            stats["files"] += 1
+            if elapsed >= stats["worst_time"]:
+                stats["worst_file"] = filepath
+                stats["worst_time"] = elapsed
+
+    def slowest(self, limit=None):
+        """
+        Rules sorted by total time (slowest first).
+
+        Args:
+            limit (int): Max number of rules (all the rules if None).
+
+        Returns:
+            list: (pattern name, stats) couples.
+        """
+        rules = sorted(self.rules.items(), key=lambda item: item[1]["time"], reverse=True)
+        return rules[:limit] if limit else rules
+
+    def save(self, output_file):
+        """
+        Write the profile of all the rules to a CSV file.
+
+        Args:
+            output_file (str): Path of the CSV file.
+        """
+        with open(output_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Pattern", "Time (s)", "Matches", "Timeouts", "Files", "Worst File", "Worst File Time (s)"])
+            for name, stats in self.slowest():
+                writer.writerow([name, f"{stats['time']:.4f}", stats["matches"], stats["timeouts"], stats["files"],
+                                 stats["worst_file"], f"{stats['worst_time']:.4f}"])
+
+    def print_slowest(self, root_folder, limit=SLOWEST_RULES):
+        """
+        Print the slowest rules table.
+
+        Args:
+            root_folder (str): Scanned folder (shortened in the table).
+            limit (int): Number of rules shown.
+        """
+        total = sum(stats["time"] for stats in self.rules.values()) or 1.0
+
+        table = [[colored(name, "green"),
+                  colored(f"{stats['time']:.2f}", "yellow"),
+                  colored(f"{100 * stats['time'] / total:.1f}%", "yellow"),
+                  colored(stats["matches"], "cyan"),
+                  colored(stats["timeouts"], "red" if stats["timeouts"] else "cyan"),
+                  colored(f"{stats['worst_file'].replace(root_folder, '...')} ({stats['worst_time']:.3f}s)", "blue")]
+                 for name, stats in self.slowest(limit)]
+
+        print("\n" + colored("=== SLOWEST RULES ===", "magenta", attrs=["bold"]))
+        print(tabulate(table, headers=[colored("Pattern", "red"), colored("Time (s)", "red"), colored("Share", "red"),
+                                       colored("Matches", "red"), colored("Timeouts", "red"), colored("Worst File", "red")],
+                       tablefmt='fancy_grid', colalign=('left', 'center', 'center', 'center', 'center', 'left')))
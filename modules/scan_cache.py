@@ -0,0 +1,173 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from modules.archive_reader import content_stat, is_archive_member, member_blocks
+
+# On-disk index of the findings of the advanced searches
+SCAN_CACHE_DB = os.path.join("results", "advanced_search", "scan_cache.sqlite3")
+# Bump it when the scanners change the findings they produce for the same rules
+SCAN_CACHE_VERSION = 1
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def rules_version(*parts):
+    """
+    Compute the version of a rule set, used to invalidate the findings produced by other rules.
+
+    Args:
+        parts: Values (str or bytes) describing the rules (e.g. name, regex and flags of each pattern).
+
+    Returns:
+        str: Hex digest identifying the rule set.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(SCAN_CACHE_VERSION).encode())
+
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        # Length prefix, so that different splits of the same bytes give different versions
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+
+    return h.hexdigest()
+
+def file_digest(filepath_tuple):
+    """
+    Compute the cache key of a file (size, mtime and content hash).
+
+    Args:
+        filepath_tuple (tuple): (root path, file path) as returned by gather_files.
+
+    Returns:
+        tuple: (size, mtime_ns, hex digest) or None if the file can't be read.
+    """
+    rootpath, filepath = filepath_tuple
+    h = hashlib.blake2b(digest_size=32)
+
+    try:
+        if is_archive_member(filepath):
+            size, mtime_ns = content_stat(filepath)
+            for block in member_blocks(filepath, HASH_BLOCK_SIZE):
+                h.update(block)
+            return size, mtime_ns, h.hexdigest()
+
+        with open(filepath, "rb") as f:
+            stat = os.fstat(f.fileno())
+
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                h.update(block)
+
+    except (FileNotFoundError, IOError):
+        return None
+
+    return stat.st_size, stat.st_mtime_ns, h.hexdigest()
+
+class ScanCache():
+    def __init__(self, db_path=SCAN_CACHE_DB):
+        """
+        Open (or create) the scan cache.
+
+        Args:
+            db_path (str): Path of the SQLite database.
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS files ("
+                         "path TEXT, rules TEXT, size INTEGER, mtime_ns INTEGER, hash TEXT, "
+                         "PRIMARY KEY (path, rules))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS findings ("
+                         "hash TEXT, rules TEXT, findings TEXT, "
+                         "PRIMARY KEY (hash, rules))")
+        # Sizes of the cached contents (only the files with the size of a cached content are hashed before the scan)
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_size ON files (rules, size)")
+
+    def lookup(self, filepath, rules):
+        """
+        Get the findings of a file not modified since the last scan (no content read).
+
+        Args:
+            filepath (str): Path of the file (or of the archive member).
+            rules (str): Version of the rule set.
+
+        Returns:
+            list: Cached findings or None if the file is unknown or modified.
+        """
+        try:
+            size, mtime_ns = content_stat(filepath)
+        except OSError:
+            return None
+
+        row = self._db.execute("SELECT findings.findings FROM files JOIN findings "
+                               "ON files.hash = findings.hash AND files.rules = findings.rules "
+                               "WHERE files.path = ? AND files.rules = ? AND files.size = ? AND files.mtime_ns = ?",
+                               (os.path.abspath(filepath), rules, size, mtime_ns)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def has_size(self, rules, size):
+        """
+        Check if a content with a given size was scanned with the same rules.
+
+        Args:
+            rules (str): Version of the rule set.
+            size (int): Size of the content.
+
+        Returns:
+            bool: True if a file with the same size is in the cache.
+        """
+        return self._db.execute("SELECT 1 FROM files WHERE rules = ? AND size = ? LIMIT 1", (rules, size)).fetchone() is not None
+
+    def lookup_hash(self, filepath, rules, digest):
+        """
+        Get the findings of a content already scanned (e.g. a touched file or the same file in another tree),
+        recording the new path, size and mtime.
+
+        Args:
+            filepath (str): Path of the file.
+            rules (str): Version of the rule set.
+            digest (tuple): (size, mtime_ns, hex digest) returned by file_digest.
+
+        Returns:
+            list: Cached findings or None if the content was never scanned with these rules.
+        """
+        size, mtime_ns, content_hash = digest
+        row = self._db.execute("SELECT findings FROM findings WHERE hash = ? AND rules = ?",
+                               (content_hash, rules)).fetchone()
+
+        if not row:
+            return None
+
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                         (os.path.abspath(filepath), rules, size, mtime_ns, content_hash))
+        return json.loads(row[0])
+
+    def store(self, filepath, rules, digest, findings):
+        """
+        Store the findings of a scanned file.
+
+        Args:
+            filepath (str): Path of the file.
+            rules (str): Version of the rule set.
+            digest (tuple): (size, mtime_ns, hex digest) returned by file_digest.
+            findings (list): JSON serializable findings of the file.
+        """
+        size, mtime_ns, content_hash = digest
+        self._db.execute("INSERT OR REPLACE INTO findings VALUES (?, ?, ?)",
+                         (content_hash, rules, json.dumps(findings)))
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                         (os.path.abspath(filepath), rules, size, mtime_ns, content_hash))
+
+    def close(self):
+        """
+        Save the changes and close the cache.
+        """
+        self._db.commit()
+        self._db.close()
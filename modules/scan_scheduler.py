@@ -0,0 +1,190 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import os
+import time
+from concurrent.futures import as_completed
+from collections import defaultdict
+from tabulate import tabulate
+from termcolor import colored
+from modules.archive_reader import content_stat, is_archive_member
+
+# Small files are grouped in work units of about BATCH_SIZE bytes
+# (to reduce the pickling and IPC cost of each task)
+BATCH_SIZE = 4 * 1024 * 1024
+MAX_BATCH_FILES = 256
+# Files larger than SPLIT_SIZE are split in byte ranges scanned by different workers
+SPLIT_SIZE = 32 * 1024 * 1024
+
+def file_size(filepath):
+    """
+    Size of a file (0 if it can't be accessed, the scan function will report the error).
+
+    Args:
+        filepath (str): Path of the file (or of the archive member).
+
+    Returns:
+        int: Size in bytes.
+    """
+    try:
+        return content_stat(filepath)[0]
+    except OSError:
+        return 0
+
+def work_units(files, split_files=True):
+    """
+    Group the files in size-balanced work units, largest first.
+
+    Args:
+        files (list): (root path, file path) couples returned by gather_files.
+        split_files (bool): Split the files larger than SPLIT_SIZE in byte ranges
+                            (not the archive members, they are decompressed as a whole).
+
+    Returns:
+        list: Work units, each one a list of (file index, (root path, file path), byte range or None).
+    """
+    units = []
+    batch = []
+    batch_size = 0
+
+    for index, filepath_tuple in enumerate(files):
+        size = file_size(filepath_tuple[1])
+
+        if split_files and size > SPLIT_SIZE and not is_archive_member(filepath_tuple[1]):
+            # Large file: one unit for each byte range
+            for start in range(0, size, SPLIT_SIZE):
+                units.append(([(index, filepath_tuple, (start, min(start + SPLIT_SIZE, size)))], min(SPLIT_SIZE, size - start)))
+            continue
+
+        if batch and (batch_size + size > BATCH_SIZE or len(batch) == MAX_BATCH_FILES):
+            units.append((batch, batch_size))
+            batch = []
+            batch_size = 0
+
+        batch.append((index, filepath_tuple, None))
+        batch_size += size
+
+    if batch:
+        units.append((batch, batch_size))
+
+    # Largest work first, so that a big file doesn't pin a single worker at the end
+    units.sort(key=lambda unit: unit[1], reverse=True)
+    return [unit for unit, _ in units]
+
+def run_unit(unit, function, args):
+    """
+    Run the scan function on all the files (or byte ranges) of a work unit (in a worker process).
+
+    Args:
+        unit (list): Work unit returned by work_units.
+        function (callable): Function scanning a single file (with a byte_range keyword argument for the ranges).
+        args (tuple): Additional arguments of the function.
+
+    Returns:
+        tuple: (worker pid, files, scanned bytes, elapsed seconds, list of (file index, byte range, results)).
+    """
+    start_time = time.perf_counter()
+    results = []
+    scanned_bytes = 0
+
+    for index, filepath_tuple, byte_range in unit:
+        if byte_range:
+            results.append((index, byte_range, function(filepath_tuple, *args, byte_range=byte_range)))
+            scanned_bytes += byte_range[1] - byte_range[0]
+        else:
+            results.append((index, byte_range, function(filepath_tuple, *args)))
+            scanned_bytes += file_size(filepath_tuple[1])
+
+    files = sum(1 for _, _, byte_range in unit if not byte_range or byte_range[0] == 0)
+    return os.getpid(), files, scanned_bytes, time.perf_counter() - start_time, results
+
+def concat_ranges(range_results):
+    """
+    Default merge of the results of the byte ranges of a file.
+
+    Args:
+        range_results (list): Results of each byte range, in file order.
+
+    Returns:
+        list: Results of the file.
+    """
+    results = []
+    for r in range_results:
+        results.extend(r)
+    return results
+
+def run_scheduled(executor, files, function, args, split_files=True, merge_ranges=concat_ranges, workers=None):
+    """
+    Run a scan function on all the files using size-balanced work units,
+    yielding the results of each file as soon as its work unit is completed.
+
+    Args:
+        executor (ProcessPoolExecutor): Pool of worker processes.
+        files (list): (root path, file path) couples returned by gather_files.
+        function (callable): Function scanning a single file.
+        args (list): Additional arguments of the function (the same for all the files).
+        split_files (bool): Split the large files in byte ranges (the function must support byte_range).
+        merge_ranges (callable): Merge the results of the byte ranges of a file.
+        workers (dict): Filled with the throughput of each worker (see print_worker_throughput).
+
+    Yields:
+        tuple: (file index in files, results of the file) in completion order.
+    """
+    if workers is None:
+        workers = {}
+
+    units = work_units(files, split_files)
+    futures = [executor.submit(run_unit, unit, function, tuple(args)) for unit in units]
+
+    # Number of byte ranges of each split file and the ones completed so far
+    expected_ranges = defaultdict(int)
+    for unit in units:
+        for index, _, byte_range in unit:
+            if byte_range:
+                expected_ranges[index] += 1
+    completed_ranges = defaultdict(list)
+
+    try:
+        for future in as_completed(futures):
+            pid, unit_files, scanned_bytes, elapsed, results = future.result()
+
+            stats = workers.setdefault(pid, {"files": 0, "bytes": 0, "time": 0.0})
+            stats["files"] += unit_files
+            stats["bytes"] += scanned_bytes
+            stats["time"] += elapsed
+
+            for index, byte_range, file_results in results:
+                if not byte_range:
+                    yield index, file_results
+                    continue
+
+                completed_ranges[index].append((byte_range[0], file_results))
+                if len(completed_ranges[index]) == expected_ranges[index]:
+                    ranges = sorted(completed_ranges.pop(index), key=lambda r: r[0])
+                    yield index, merge_ranges([r for _, r in ranges])
+    finally:
+        # The pool is shared by the session: the work of an interrupted search must not keep it busy
+        for future in futures:
+            future.cancel()
+
+def print_worker_throughput(workers):
+    """
+    Print the throughput of each worker process.
+
+    Args:
+        workers (dict): Throughput of each worker returned by run_scheduled.
+    """
+    if not workers:
+        return
+
+    rows = []
+    for pid, stats in sorted(workers.items()):
+        mb = stats["bytes"] / (1024 * 1024)
+        speed = mb / stats["time"] if stats["time"] else 0
+        rows.append([pid, stats["files"], f"{mb:.1f}", f"{stats['time']:.1f}", f"{speed:.1f}"])
+
+    headers = [colored(h, "blue") for h in ["Worker PID", "Files", "MB", "Time (s)", "MB/s"]]
+    print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
@@ -83,6 +83,7 @@ class DaemonTaskManager():
         self._ID = 0
         self._TASK_HEADERS = ['Functionality', 'Task ID']
         self._ADDITIONAL_HEADERS = []
+        self._CLEANUP_CALLBACKS = []
 
     def add_task(self, functionality, command, args=None):
         """
@@ -148,6 +149,21 @@ class DaemonTaskManager():
         for func_id in tasks_info:
             self.stop_task(func_id[0], func_id[1])
 
+        # Session-wide resources (e.g. the worker pool of the advanced search)
+        for callback in self._CLEANUP_CALLBACKS:
+            callback()
+        self._CLEANUP_CALLBACKS = []
+
+    def add_cleanup(self, callback):
+        """
+        Register a function called when all the tasks are stopped (end of the session).
+
+        Args:
+            callback (callable): Function without arguments.
+        """
+        if callback not in self._CLEANUP_CALLBACKS:
+            self._CLEANUP_CALLBACKS.append(callback)
+
     def get_dict(self):
         """
         Get the dictionary of all tasks.
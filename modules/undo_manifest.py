@@ -0,0 +1,236 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+MANIFEST_NAME = "manifest.json"
+HASH_BLOCK_SIZE = 1024 * 1024
+# Keys of each file of a manifest
+ENTRY_KEYS = {"file", "backup", "replaced_hash"}
+
+def backup_path(backup_folder, filepath):
+    """
+    Path of the backup of a file (unique for each file path).
+
+    Args:
+        backup_folder (str): Folder of the backups of a replacement.
+        filepath (str): Path of the original file.
+
+    Returns:
+        str: Path of the backup.
+    """
+    name = hashlib.blake2b(os.path.abspath(filepath).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(backup_folder, f"{name}_{os.path.basename(filepath)}")
+
+def backup_file(backup_folder, filepath):
+    """
+    Keep the original content of a file before it is replaced.
+    The backup is a hard link when possible (no copy, the replaced file is a new file),
+    otherwise a copy.
+
+    Args:
+        backup_folder (str): Folder of the backups of a replacement.
+        filepath (str): Path of the file to be replaced.
+
+    Returns:
+        str: Path of the backup.
+    """
+    backup = backup_path(backup_folder, filepath)
+
+    try:
+        os.link(filepath, backup)
+    except OSError:
+        # Different file systems or no hard links support
+        shutil.copy2(filepath, backup)
+
+    return backup
+
+def write_temp_file(filepath, chunks):
+    """
+    Write the new content of a file to a temporary file in the same folder (same permissions of the file).
+
+    Args:
+        filepath (str): Path of the file.
+        chunks (iterable): Blocks of bytes of the new content.
+
+    Returns:
+        tuple: (path of the temporary file, hex digest of the new content)
+    """
+    h = hashlib.blake2b(digest_size=32)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filepath)), prefix=".replace_")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                h.update(chunk)
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        shutil.copymode(filepath, temp_path)
+
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return temp_path, h.hexdigest()
+
+def replace_file(temp_path, filepath):
+    """
+    Rename a temporary file over the original one, so that the file is never left half written.
+
+    Args:
+        temp_path (str): Path of the temporary file returned by write_temp_file.
+        filepath (str): Path of the file.
+    """
+    try:
+        os.replace(temp_path, filepath)
+    except OSError:
+        os.remove(temp_path)
+        raise
+
+def atomic_write_file(filepath, chunks):
+    """
+    Replace the content of a file atomically.
+
+    Args:
+        filepath (str): Path of the file.
+        chunks (iterable): Blocks of bytes of the new content.
+
+    Returns:
+        str: Hex digest of the new content.
+    """
+    temp_path, new_hash = write_temp_file(filepath, chunks)
+    replace_file(temp_path, filepath)
+
+    return new_hash
+
+def content_hash(filepath):
+    """
+    Hex digest of the content of a file.
+
+    Args:
+        filepath (str): Path of the file.
+
+    Returns:
+        str: Hex digest of the content.
+    """
+    h = hashlib.blake2b(digest_size=32)
+
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+class UndoManifest():
+    def __init__(self, backup_folder):
+        """
+        Record of the files changed by a replacement, used to restore their original content.
+
+        Args:
+            backup_folder (str): Folder containing the backups and the manifest.
+        """
+        self.backup_folder = backup_folder
+        self.manifest_file = os.path.join(backup_folder, MANIFEST_NAME)
+        self.entries = []
+
+    def add(self, filepath, backup, replaced_hash, count):
+        """
+        Record a replaced file.
+
+        Args:
+            filepath (str): Path of the replaced file.
+            backup (str): Path of the backup of the original content.
+            replaced_hash (str): Hex digest of the new content.
+            count (int): Number of replacements.
+        """
+        self.entries.append({
+            "file": os.path.abspath(filepath),
+            "backup": os.path.abspath(backup),
+            "replaced_hash": replaced_hash,
+            "replacements": count
+        })
+
+    def save(self, search_bytes, replace_bytes):
+        """
+        Write the manifest.
+
+        Args:
+            search_bytes (bytes): The replaced byte sequence.
+            replace_bytes (bytes): The new byte sequence.
+        """
+        with open(self.manifest_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "search": search_bytes.hex(),
+                "replace": replace_bytes.hex(),
+                "files": self.entries
+            }, f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a manifest.
+
+        Args:
+            path (str): Path of the manifest or of the folder containing it.
+
+        Returns:
+            UndoManifest: The loaded manifest.
+
+        Raises:
+            IOError: If the manifest can't be read or is corrupt.
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, MANIFEST_NAME)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise IOError(f"Invalid undo manifest {path}: {e}")
+
+        entries = data.get("files") if isinstance(data, dict) else None
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) and ENTRY_KEYS <= entry.keys() for entry in entries):
+            raise IOError(f"Corrupt undo manifest {path}: missing or invalid list of files")
+
+        manifest = cls(os.path.dirname(path))
+        manifest.entries = entries
+        return manifest
+
+    def restore(self):
+        """
+        Restore the original content of the replaced files.
+        A file modified after the replacement is not restored.
+
+        Returns:
+            tuple: (restored files, skipped files)
+        """
+        restored, skipped = [], []
+
+        for entry in self.entries:
+            filepath = entry["file"]
+
+            try:
+                if content_hash(filepath) != entry["replaced_hash"]:
+                    skipped.append(filepath)
+                    continue
+
+                with open(entry["backup"], "rb") as f:
+                    atomic_write_file(filepath, iter(lambda: f.read(HASH_BLOCK_SIZE), b""))
+
+            except (FileNotFoundError, IOError):
+                skipped.append(filepath)
+                continue
+
+            restored.append(filepath)
+
+        return restored, skipped
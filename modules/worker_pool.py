@@ -0,0 +1,65 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from modules.tasks_management import DAEMONS_MANAGER
+
+# Number of worker processes (all the cores if not set)
+WORKERS_ENV = "HACKNDROID_WORKERS"
+
+_WORKER_POOL = None
+
+def worker_count():
+    """
+    Number of worker processes (HACKNDROID_WORKERS environment variable, all the cores if missing or invalid).
+
+    Returns:
+        int: Number of worker processes.
+    """
+    try:
+        workers = int(os.environ.get(WORKERS_ENV, ""))
+    except ValueError:
+        workers = 0
+
+    return workers if workers > 0 else os.cpu_count()
+
+def init_worker():
+    """
+    Initializer of the worker processes: compile the secrets patterns once for the whole session.
+    """
+    from modules.advanced_search import warm_up
+    warm_up()
+
+def get_worker_pool():
+    """
+    Get the pool of worker processes of the session, created on the first use
+    and shut down when the session ends (see DaemonTaskManager.stop_all_tasks).
+
+    Returns:
+        ProcessPoolExecutor: The worker pool.
+    """
+    global _WORKER_POOL
+
+    # A pool whose worker died abruptly can't run new tasks
+    if _WORKER_POOL is not None and getattr(_WORKER_POOL, "_broken", False):
+        shutdown_worker_pool()
+
+    if _WORKER_POOL is None:
+        _WORKER_POOL = ProcessPoolExecutor(max_workers=worker_count(), initializer=init_worker)
+        DAEMONS_MANAGER.add_cleanup(shutdown_worker_pool)
+
+    return _WORKER_POOL
+
+def shutdown_worker_pool():
+    """
+    Shut down the worker pool of the session (the pending tasks are cancelled).
+    """
+    global _WORKER_POOL
+
+    if _WORKER_POOL is not None:
+        _WORKER_POOL.shutdown(wait=True, cancel_futures=True)
+        _WORKER_POOL = None
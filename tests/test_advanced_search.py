@@ -0,0 +1,59 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from modules import advanced_search, needle_matcher
+from modules.advanced_search import bytes_search_in_file, needles_search_in_file, search_variants
+from modules.encoding_variants import UTF16BE, UTF16LE
+
+class UTF16EndiannessTest(unittest.TestCase):
+    """
+    A UTF-16 text matches both the UTF-16LE and the UTF-16BE variants (one byte apart):
+    each occurrence must be reported once, with the endianness of its string.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, content):
+        filepath = os.path.join(self.folder, "content.bin")
+        with open(filepath, "wb") as f:
+            f.write(content)
+        return (self.folder, filepath)
+
+    def needle_encodings(self, filepath_tuple):
+        advanced_search._NEEDLE_MATCHERS.clear()
+        return [encoding for _, _, _, encoding in needles_search_in_file(filepath_tuple, [("secret_value", b"secret_value")])]
+
+    def test_string_search(self):
+        for codec, encoding in (("utf-16-le", UTF16LE), ("utf-16-be", UTF16BE)):
+            filepath_tuple = self.write("prefix secret_value here".encode(codec))
+            matches = bytes_search_in_file(filepath_tuple, b"secret_value", search_variants("secret_value", b"secret_value"))
+            self.assertEqual([(found, found_encoding) for _, found, found_encoding in matches], [("secret_value", encoding)])
+
+    def test_needle_search(self):
+        for codec, encoding in (("utf-16-le", UTF16LE), ("utf-16-be", UTF16BE)):
+            filepath_tuple = self.write("prefix secret_value here".encode(codec))
+            self.assertEqual(self.needle_encodings(filepath_tuple), [encoding])
+
+    def test_needle_search_without_automaton(self):
+        automaton, needle_matcher.ahocorasick = needle_matcher.ahocorasick, None
+        try:
+            for codec, encoding in (("utf-16-le", UTF16LE), ("utf-16-be", UTF16BE)):
+                filepath_tuple = self.write("prefix secret_value here".encode(codec))
+                self.assertEqual(self.needle_encodings(filepath_tuple), [encoding])
+        finally:
+            needle_matcher.ahocorasick = automaton
+            advanced_search._NEEDLE_MATCHERS.clear()
+
+if __name__ == "__main__":
+    unittest.main()
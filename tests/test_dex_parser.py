@@ -0,0 +1,70 @@
+"""
+This source file is part of the HacknDroid project.
+
+Licensed under the Apache License v2.0
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zipfile
+from modules.dex_parser import HEADER_SIZE, DexError, DexFile, dex_hints
+
+RULES = {"Root Detection Hints": {"Root": [r"supersu"]}}
+
+def dex_content(string_data, string_offset=HEADER_SIZE + 4):
+    """
+    Minimal DEX file with a single string (no types, methods or classes).
+
+    Args:
+        string_data (bytes): The string_data_item (uleb128 size and MUTF-8 bytes).
+        string_offset (int): Offset of the string_data_item stored in the string table.
+
+    Returns:
+        bytes: Content of the DEX file.
+    """
+    header = bytearray(HEADER_SIZE)
+    header[0:8] = b"dex\n035\x00"
+    struct.pack_into("<12I", header, 0x38, 1, HEADER_SIZE, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    return bytes(header) + struct.pack("<I", string_offset) + string_data
+
+class TruncatedDexTest(unittest.TestCase):
+    """
+    A truncated or corrupted string section must raise DexError (reported by the fast APK analysis),
+    not IndexError or struct.error.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_valid_string(self):
+        self.assertEqual(DexFile(dex_content(b"\x07supersu\x00")).string(0), "supersu")
+
+    def test_truncated_string_size(self):
+        # uleb128 size with the continuation bit set at the end of the file
+        with self.assertRaises(DexError):
+            DexFile(dex_content(b"\x87")).string(0)
+
+    def test_string_out_of_file(self):
+        with self.assertRaises(DexError):
+            DexFile(dex_content(b"\x07supersu\x00", string_offset=0x10000)).string(0)
+
+    def test_type_out_of_table(self):
+        with self.assertRaises(DexError):
+            DexFile(dex_content(b"\x07supersu\x00")).type_name(3)
+
+    def test_truncated_dex_in_apk(self):
+        apk_filepath = os.path.join(self.folder, "app.apk")
+        with zipfile.ZipFile(apk_filepath, "w") as apk:
+            apk.writestr("classes.dex", dex_content(b"\x87"))
+
+        with self.assertRaises(DexError):
+            list(dex_hints(apk_filepath, RULES, list(RULES)))
+
+if __name__ == "__main__":
+    unittest.main()